@@ -3,7 +3,11 @@ from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-from users.routes import users_bp
+from config import WARMUP_ON_START, MONGO_ENSURE_INDEXES
+from models.startup import timed, print_startup_report, start_background_warmup, start_background_index_check
+from models.metrics import init_app as init_metrics
+with timed("routes.users"):
+    from users.routes import users_bp
 # Load environment variables
 load_dotenv()
 
@@ -19,18 +23,27 @@ else:
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
+init_metrics(app)  # Per-request latency histograms and the Server-Timing header
 
 # Set Flask secret key
 app.config["SECRET_KEY"] = SECRET_KEY
 
-# Import existing routes
+# Import existing routes (heavy models and clients are created lazily on first use)
 
-from routes.upload_routes import upload_bp
-from routes.query_routes import query_bp
-from users.routes import users_bp
-from routes.exam_routes import exam_bp  # New Exam Routes
-from routes.feedback_routes import feedback_bp  # New Feedback Routes
-from routes.admin_routes import admin_bp  # New Admin Routes
+with timed("routes.upload_routes"):
+    from routes.upload_routes import upload_bp
+with timed("routes.query_routes"):
+    from routes.query_routes import query_bp
+with timed("routes.exam_routes"):
+    from routes.exam_routes import exam_bp  # New Exam Routes
+with timed("routes.feedback_routes"):
+    from routes.feedback_routes import feedback_bp  # New Feedback Routes
+with timed("routes.admin_routes"):
+    from routes.admin_routes import admin_bp  # New Admin Routes
+with timed("routes.stream_routes"):
+    from routes.stream_routes import stream_bp  # Streaming (SSE) Routes
+with timed("routes.metrics_routes"):
+    from routes.metrics_routes import metrics_bp  # Prometheus /metrics
 
 # Register Routes
 
@@ -40,6 +53,18 @@ app.register_blueprint(users_bp, url_prefix="/users")
 app.register_blueprint(exam_bp, url_prefix="/exam")
 app.register_blueprint(feedback_bp, url_prefix="/feedback")
 app.register_blueprint(admin_bp, url_prefix="/admin")
+app.register_blueprint(stream_bp, url_prefix="/stream")
+app.register_blueprint(metrics_bp)
+
+print_startup_report()
+
+# Check Mongo indexes and load models and clients in the background once the server is up
+# (not in process-pool workers, which import this module as __mp_main__ when started with "spawn")
+if __name__ != "__mp_main__":
+    if MONGO_ENSURE_INDEXES:
+        start_background_index_check()
+    if WARMUP_ON_START:
+        start_background_warmup()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
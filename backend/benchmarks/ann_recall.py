@@ -0,0 +1,61 @@
+"""
+Recall@k and latency of the local IVF index against exact brute-force search.
+
+Usage (from backend/):
+    python -m benchmarks.ann_recall --vectors 200000 --queries 200 --k 5 --nprobe 4 8 16 32
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from models.vector_store import LocalVectorStore, EMBEDDING_DIMENSION
+
+def make_corpus(count, dimension, clusters, noise, seed=0):
+    """Clustered synthetic vectors, roughly shaped like topic-grouped textbook chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    return (centers[labels] + noise * rng.normal(size=(count, dimension))).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=2.0, help="Spread within clusters; higher is harder")
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.vectors + args.queries, EMBEDDING_DIMENSION, args.clusters, args.noise)
+    queries = corpus[args.vectors:]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, index_mode="ivf")
+        store.ann.nlist = args.nlist
+        store.ann.min_train = 1
+
+        started = time.perf_counter()
+        for start in range(0, args.vectors, 10000):
+            stop = min(start + 10000, args.vectors)
+            store.upsert((f"v{i}", corpus[i], {"grade": str(i % 12)}) for i in range(start, stop))
+        store.ann.train(store._vectors[:len(store)])
+        print(f"Inserted + trained {args.vectors} vectors in {time.perf_counter() - started:.1f}s "
+              f"({store.ann.centroids.shape[0]} lists)")
+
+        started = time.perf_counter()
+        truth = [{match["id"] for match in store.query(q, args.k, exact=True)} for q in queries]
+        exact_ms = (time.perf_counter() - started) * 1000 / args.queries
+        print(f"exact       recall@{args.k}=1.000  {exact_ms:7.2f} ms/query")
+
+        for nprobe in args.nprobe:
+            started = time.perf_counter()
+            found = [{match["id"] for match in store.query(q, args.k, nprobe=nprobe)} for q in queries]
+            ann_ms = (time.perf_counter() - started) * 1000 / args.queries
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(f"nprobe={nprobe:<4} recall@{args.k}={recall:.3f}  {ann_ms:7.2f} ms/query  "
+                  f"({exact_ms / ann_ms:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Load test comparing the sync and async RAG answer paths: throughput and latency percentiles
+at a fixed number of concurrent requests.
+
+In-process (no server), the sync path runs answer_query on a pool of --workers threads, like a
+threaded WSGI server; the async path keeps every request on the shared event loop and only
+holds an I/O thread while an upstream call is in flight. Set LLM_BACKEND=fake and
+FAKE_LLM_DELAY_MS to simulate Gemini latency offline.
+
+Against a running server, --url compares POST /query/answer with POST /query/answer/async.
+
+Usage (from backend/):
+    LLM_BACKEND=fake FAKE_LLM_DELAY_MS=300 VECTOR_BACKEND=local \\
+        python -m benchmarks.async_load --requests 400 --concurrency 64 --workers 8
+    python -m benchmarks.async_load --url http://localhost:5000 --token <jwt> --requests 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+def report(label, latencies, elapsed):
+    print(f"{label:<6} {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50={percentile_ms(latencies, 50):8.1f} ms  p95={percentile_ms(latencies, 95):8.1f} ms  "
+          f"p99={percentile_ms(latencies, 99):8.1f} ms")
+
+def timed_call(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+def run_threads(fn, queries, workers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(lambda query: timed_call(fn, query), queries))
+    return latencies, time.perf_counter() - started
+
+def bench_in_process(queries, args):
+    from models.gemini import answer_query
+    from models.async_rag import UPSTREAM_LIMITS, get_runtime, answer_query_async
+
+    print(f"sync: {args.workers} threads; async upstream limits: {UPSTREAM_LIMITS}")
+
+    latencies, elapsed = run_threads(answer_query, [f"{query} (sync)" for query in queries], args.workers)
+    report("sync", latencies, elapsed)
+
+    async def load():
+        gate = asyncio.Semaphore(args.concurrency)
+
+        async def one(query):
+            async with gate:
+                started = time.perf_counter()
+                await answer_query_async(query)
+                return time.perf_counter() - started
+
+        return await asyncio.gather(*[one(f"{query} (async)") for query in queries])
+
+    started = time.perf_counter()
+    latencies = get_runtime().run(load(), timeout=None)
+    report("async", latencies, time.perf_counter() - started)
+
+def bench_http(queries, args):
+    def post(path):
+        def call(query):
+            request = urllib.request.Request(
+                args.url.rstrip("/") + path,
+                data=json.dumps({"query": query}).encode(),
+                headers={"Content-Type": "application/json", "Authorization": f"Bearer {args.token}"},
+            )
+            with urllib.request.urlopen(request) as response:
+                response.read()
+        return call
+
+    for label, path in (("sync", "/query/answer"), ("async", "/query/answer/async")):
+        latencies, elapsed = run_threads(post(path), [f"{query} ({label})" for query in queries], args.concurrency)
+        report(label, latencies, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at once")
+    parser.add_argument("--workers", type=int, default=8, help="Server threads for the in-process sync path")
+    parser.add_argument("--url", help="Benchmark a running server instead of calling the models in-process")
+    parser.add_argument("--token", default="", help="JWT for --url requests")
+    args = parser.parse_args()
+
+    # Distinct queries (also per path) so the response cache doesn't serve repeats
+    queries = [f"Explain topic number {i} in photosynthesis" for i in range(args.requests)]
+    print(f"{args.requests} requests, {args.concurrency} concurrent")
+    if args.url:
+        bench_http(queries, args)
+    else:
+        bench_in_process(queries, args)
+
+if __name__ == "__main__":
+    main()
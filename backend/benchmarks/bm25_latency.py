@@ -0,0 +1,61 @@
+"""
+BM25 index build and query latency over a synthetic chunk corpus.
+
+Usage (from backend/):
+    python -m benchmarks.bm25_latency --chunks 100000 --queries 500
+"""
+import argparse
+import time
+import numpy as np
+from models.bm25 import BM25Index
+from models.retrieval import reciprocal_rank_fusion
+
+def make_chunks(count, vocabulary, words_per_chunk, seed=0):
+    """Chunks of Zipf-distributed words, roughly matching the splitter's ~500-character output."""
+    rng = np.random.default_rng(seed)
+    words = [f"term{i}" for i in range(vocabulary)]
+    ranks = np.minimum(rng.zipf(1.2, size=(count, words_per_chunk)), vocabulary) - 1
+    return [" ".join(words[r] for r in row) for row in ranks]
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=80, help="Words per chunk")
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.vocabulary, args.words)
+    index = BM25Index(path=None)
+
+    started = time.perf_counter()
+    for i, chunk in enumerate(chunks):
+        index.add(f"doc_{i}", chunk, {"grade": str(i % 12), "subject": "science", "filename": f"book{i % 40}.pdf"})
+    build_seconds = time.perf_counter() - started
+    print(f"Built BM25 index over {args.chunks} chunks in {build_seconds:.2f}s "
+          f"({args.chunks / build_seconds:,.0f} chunks/s, {len(index.postings):,} terms)")
+
+    rng = np.random.default_rng(1)
+    queries = [" ".join(f"term{t}" for t in rng.integers(0, 2000, size=rng.integers(2, 6)))
+               for _ in range(args.queries)]
+
+    for label, search_filter in (("unfiltered", None), ("grade filter", {"grade": "5"})):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, top_k=args.top_k, filter=search_filter)
+            latencies.append(time.perf_counter() - started)
+        print(f"query {label:<13} p50={percentile_ms(latencies, 50):6.2f} ms  p95={percentile_ms(latencies, 95):6.2f} ms")
+
+    rankings = [[f"doc_{i}" for i in rng.permutation(args.chunks)[:args.top_k]] for _ in range(2)]
+    started = time.perf_counter()
+    for _ in range(1000):
+        reciprocal_rank_fusion(rankings)
+    print(f"RRF fusion of two top-{args.top_k} lists: {(time.perf_counter() - started):.3f} ms/call")
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,112 @@ load_dotenv()
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GENAI_API_KEY = os.getenv("GENAI_API_KEY")
 MONGO_URI = os.getenv("MONGO_URI")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME") 
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "education-ai")
 SECRET_KEY = os.getenv("SECRET_KEY")
 
-print(f"🔑 SECRET_KEY: {SECRET_KEY}")
\ No newline at end of file
+# Vector store
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone" or "local"
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(os.path.dirname(__file__), "data", "vectors"))
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "flat")  # "flat" (exact) or "ivf" (approximate)
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # Number of IVF lists; 0 picks ~sqrt(vectors)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))  # Lists scanned per query; higher = better recall, slower
+IVF_MIN_TRAIN = int(os.getenv("IVF_MIN_TRAIN", "10000"))  # Below this the store stays exact
+
+# Hybrid lexical + vector retrieval. The BM25 index is a file on each host (BM25_PATH), filled only by
+# uploads handled on that host; leave it off until existing files are re-uploaded (or the file is
+# copied) so every host's index covers the whole vector store.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "false").lower() == "true"
+BM25_PATH = os.getenv("BM25_PATH", os.path.join(os.path.dirname(__file__), "data", "bm25.pkl"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # Depth of each ranking before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# LLM
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "gemini" or "fake" (offline stub for tests)
+FAKE_LLM_DELAY_MS = float(os.getenv("FAKE_LLM_DELAY_MS", "20"))  # Per streamed word
+
+# Cross-encoder reranking
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))  # Over-fetch depth before reranking
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+RERANK_TOKEN_BUDGET = int(os.getenv("RERANK_TOKEN_BUDGET", "1200"))  # Context tokens kept after reranking
+RERANK_TIME_BUDGET_MS = float(os.getenv("RERANK_TIME_BUDGET_MS", "150"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+
+# Prompt assembly: context token budgets per endpoint
+PROMPT_TOKEN_BUDGET_ANSWER = int(os.getenv("PROMPT_TOKEN_BUDGET_ANSWER", "1500"))
+PROMPT_TOKEN_BUDGET_EXAM = int(os.getenv("PROMPT_TOKEN_BUDGET_EXAM", "2000"))
+
+# Batch exam generation / marking
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", "4"))  # Concurrent Gemini calls per batch
+BATCH_LLM_RATE = float(os.getenv("BATCH_LLM_RATE", "2"))  # Gemini calls started per second across batches; 0 disables
+BATCH_LLM_RETRIES = int(os.getenv("BATCH_LLM_RETRIES", "3"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+# Exam question bank
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "false").lower() == "true"  # Opt-in: serve exams from the bank
+QUESTION_BANK_DEDUP_SIMILARITY = float(os.getenv("QUESTION_BANK_DEDUP_SIMILARITY", "0.92"))  # Cosine; above this is a duplicate
+QUESTION_BANK_TARGET = int(os.getenv("QUESTION_BANK_TARGET", "50"))  # Questions per grade/subject/difficulty to keep stocked
+QUESTION_BANK_TOPUP_BATCH = int(os.getenv("QUESTION_BANK_TOPUP_BATCH", "10"))  # Questions asked for per top-up call
+QUESTION_BANK_TOPUP_ROUNDS = int(os.getenv("QUESTION_BANK_TOPUP_ROUNDS", "5"))  # Max Gemini calls per top-up
+
+# Ingestion tuning
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_MAX_BYTES = int(os.getenv("UPSERT_MAX_BYTES", str(2 * 1024 * 1024)))  # Pinecone request cap is 2 MB
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+UPSERT_RETRIES = int(os.getenv("UPSERT_RETRIES", "3"))
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+INGEST_BACKEND = os.getenv("INGEST_BACKEND", "local")  # "local" runs jobs on an in-process worker pool
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR")  # Defaults to the system temp directory
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))  # Smaller PDFs extract single-process
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "32"))
+
+# Query embedding cache
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "0"))  # Seconds; 0 disables expiry
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")  # SQLite file shared across workers; unset keeps it in-process
+QUERY_CACHE_SHARED_SIZE = int(os.getenv("QUERY_CACHE_SHARED_SIZE", "100000"))  # Rows kept in the shared SQLite file
+
+# Gemini response cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))  # Cosine threshold; 0 disables semantic hits
+
+# Startup
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"  # Load models and open clients in the background
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"  # Create/verify indexes at startup, independent of warm-up
+
+# User sessions
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "mongo")  # "mongo", "sqlite" (one host) or "memory" (single worker)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "sessions.db"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))  # Seconds a worker trusts its last revocation check
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+# Password hashing
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")  # werkzeug method, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))  # Processes; 0 hashes inline
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))  # Running + queued hashes per worker process
+PASSWORD_HASH_WAIT = float(os.getenv("PASSWORD_HASH_WAIT", "5"))  # Seconds to wait for a slot before answering 503
+
+# Write-behind buffer for history/feedback/exam inserts
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BUFFER_SIZE = int(os.getenv("WRITE_BUFFER_SIZE", "10000"))  # Documents held before put() blocks
+WRITE_BUFFER_BATCH = int(os.getenv("WRITE_BUFFER_BATCH", "200"))  # Flush once this many are waiting...
+WRITE_BUFFER_INTERVAL = float(os.getenv("WRITE_BUFFER_INTERVAL", "1.0"))  # ...or after this many seconds
+WRITE_BUFFER_PUT_TIMEOUT = float(os.getenv("WRITE_BUFFER_PUT_TIMEOUT", "0.5"))  # Backpressure wait before dropping
+
+# Async serving path: in-flight calls allowed per upstream
+ASYNC_IO_THREADS = int(os.getenv("ASYNC_IO_THREADS", "64"))  # Threads running blocking client calls for the event loop
+ASYNC_LIMIT_EMBEDDING = int(os.getenv("ASYNC_LIMIT_EMBEDDING", "4"))
+ASYNC_LIMIT_VECTOR = int(os.getenv("ASYNC_LIMIT_VECTOR", "16"))
+ASYNC_LIMIT_LLM = int(os.getenv("ASYNC_LIMIT_LLM", "8"))
+ASYNC_LIMIT_MONGO = int(os.getenv("ASYNC_LIMIT_MONGO", "16"))
+ASYNC_REQUEST_TIMEOUT = float(os.getenv("ASYNC_REQUEST_TIMEOUT", "120"))  # Seconds a request waits on the loop
+
+print(f"🔑 SECRET_KEY: {SECRET_KEY}")
+
+# Metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Bearer token required by GET /metrics; unset only answers loopback requests
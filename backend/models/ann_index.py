@@ -0,0 +1,128 @@
+import logging
+import os
+import numpy as np
+from config import IVF_NLIST, IVF_NPROBE, IVF_MIN_TRAIN
+
+class IVFIndex:
+    """
+    Inverted-file approximate index for LocalVectorStore.
+    Rows are assigned to the nearest of nlist k-means centroids; a query only scores rows in the
+    nprobe closest lists. Assignments are kept as one int per store row, plus the inverted lists
+    themselves (an array of row numbers per centroid), so a query only touches the probed lists.
+    Inserts are a nearest-centroid lookup appended to their lists; deletes compact the assignments
+    the same way the store's matrix does and rebuild the lists. Raising nprobe trades latency for recall.
+    """
+
+    def __init__(self, nlist=IVF_NLIST, nprobe=IVF_NPROBE, min_train=IVF_MIN_TRAIN):
+        self.nlist = nlist  # 0 picks ~sqrt(rows) at training time
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.lists = []  # list id -> int64 array of rows
+        self.trained_count = 0
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors, iterations=10, sample_size=50000, seed=0):
+        """Runs spherical k-means over (a sample of) unit-normalized rows and reassigns every row."""
+        rng = np.random.default_rng(seed)
+        count = vectors.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(count)))
+        sample = vectors[rng.choice(count, size=min(sample_size, count), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=min(nlist, sample.shape[0]), replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(centroids.shape[0]):
+                members = sample[labels == list_id]
+                if members.size:
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[list_id] = centroid / norm if norm else centroid
+
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = self._assign(vectors)
+        self._build_lists()
+        self.trained_count = count
+        logging.info(f"✅ Trained IVF index: {centroids.shape[0]} lists over {count} vectors.")
+
+    def _assign(self, vectors, chunk=65536):
+        labels = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], chunk):
+            labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ self.centroids.T, axis=1)
+        return labels
+
+    def _build_lists(self):
+        """Groups rows by assigned list with one sort of the assignments."""
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.centroids.shape[0] + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.centroids.shape[0])]
+
+    def update(self, vectors, rows):
+        """
+        Records new or replaced rows. Trains once the store reaches min_train rows and retrains
+        when it has grown 4x since the last training, so lists stay balanced as uploads arrive.
+        """
+        count = vectors.shape[0]
+        if not self.trained:
+            if count >= self.min_train:
+                self.train(vectors)
+            return
+        if count > 4 * self.trained_count:
+            self.train(vectors)
+            return
+
+        known = self.assignments.shape[0]
+        if known < count:
+            grown = np.empty(count, dtype=np.int32)
+            grown[:known] = self.assignments
+            self.assignments = grown
+        rows = np.asarray(rows, dtype=np.int64)
+        if not rows.size:
+            return
+        labels = self._assign(vectors[rows])
+        replaced = rows < known
+        moved = bool(np.any(self.assignments[rows[replaced]] != labels[replaced]))
+        self.assignments[rows] = labels
+        if moved:
+            self._build_lists()  # A replaced row changed lists; rare enough to regroup everything
+            return
+        added, added_labels = rows[~replaced], labels[~replaced]
+        for list_id in np.unique(added_labels):
+            self.lists[list_id] = np.concatenate([self.lists[list_id], added[added_labels == list_id]])
+
+    def compact(self, keep):
+        """Drops deleted rows, mirroring LocalVectorStore.delete."""
+        if self.trained:
+            self.assignments = self.assignments[keep]
+            self._build_lists()
+
+    def candidates(self, query_vector, nprobe=None):
+        """Row numbers in the nprobe lists whose centroids are closest to the query."""
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        probe = np.argpartition(-(self.centroids @ query_vector), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[list_id] for list_id in probe])
+
+    def save(self, directory):
+        if not self.trained:
+            return
+        np.save(os.path.join(directory, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "ivf_assignments.npy"), self.assignments)
+
+    def load(self, directory, count):
+        """Loads a saved index if it matches the store's row count; otherwise it is retrained on next write."""
+        centroids_path = os.path.join(directory, "ivf_centroids.npy")
+        assignments_path = os.path.join(directory, "ivf_assignments.npy")
+        if not os.path.exists(centroids_path) or not os.path.exists(assignments_path):
+            return
+        assignments = np.load(assignments_path)
+        if assignments.shape[0] != count:
+            logging.warning("⚠️ Saved IVF index is out of date; it will be retrained.")
+            return
+        self.centroids = np.load(centroids_path)
+        self.assignments = assignments
+        self._build_lists()
+        self.trained_count = count
@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import (
+    ASYNC_IO_THREADS, ASYNC_LIMIT_EMBEDDING, ASYNC_LIMIT_VECTOR, ASYNC_LIMIT_LLM, ASYNC_LIMIT_MONGO,
+    ASYNC_REQUEST_TIMEOUT, RERANK_ENABLED,
+)
+from models.embedding import embed_query
+from models.gemini import (
+    get_llm, elapsed_ms, answer_retrieval_depth, find_similar_answer, rerank_matches, prepare_generation,
+    answer_result, log_answer, exam_context, format_exam_prompt,
+)
+from models.retrieval import get_retrieval_service
+
+UPSTREAM_LIMITS = {
+    "embedding": ASYNC_LIMIT_EMBEDDING,  # Local model inference (query embeddings and reranking)
+    "vector": ASYNC_LIMIT_VECTOR,
+    "llm": ASYNC_LIMIT_LLM,
+    "mongo": ASYNC_LIMIT_MONGO,
+}
+
+class AsyncRuntime:
+    """
+    One asyncio event loop on a background thread, shared by every Flask worker thread.
+    The upstream clients (SentenceTransformer, Pinecone, Gemini, PyMongo) are blocking, so each
+    call runs on an I/O thread pool behind a per-upstream semaphore: a request only holds a
+    thread while one of its calls is in flight, and a slow upstream can't take every thread.
+    """
+
+    def __init__(self, io_threads=ASYNC_IO_THREADS, limits=UPSTREAM_LIMITS):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="async-io"))
+        self.limits = {upstream: asyncio.Semaphore(limit) for upstream, limit in limits.items()}
+        self._background = set()  # Strong refs so fire-and-forget tasks aren't garbage collected
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=ASYNC_REQUEST_TIMEOUT):
+        """
+        Runs a coroutine on the loop and blocks the calling (Flask) thread until it finishes.
+        On timeout the coroutine is cancelled so it doesn't keep waiting for upstream slots.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def call(self, upstream, fn, *args, **kwargs):
+        """Runs a blocking upstream call on the I/O pool once the upstream has a free slot."""
+        async with self.limits[upstream]:
+            return await self.loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    def spawn(self, coro, description):
+        """Schedules work nobody waits on (e.g. Mongo logging); failures are logged, not raised."""
+        task = self.loop.create_task(coro)
+        self._background.add(task)
+
+        def done(task):
+            self._background.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logging.error(f"❌ Background {description} failed: {str(task.exception())}")
+
+        task.add_done_callback(done)
+        return task
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+def get_runtime():
+    """Returns the shared async runtime, starting its event loop thread on first use."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = AsyncRuntime()
+    return _runtime
+
+def run_async(coro):
+    return get_runtime().run(coro)
+
+async def retrieve_async(query, filters, top_k=5, query_embedding=None):
+    """
+    Searches every (grade, subject) filter concurrently and merges the results by score,
+    keeping each chunk once.
+    :return: [{"id", "score", "text", "filename"}] best first, or {"error": ...} if every search failed
+    """
+    runtime = get_runtime()
+    service = get_retrieval_service()
+    results = await asyncio.gather(*[
+        runtime.call("vector", service.search, query, grade, subject, top_k, query_embedding)
+        for grade, subject in filters
+    ])
+
+    merged = {}
+    for matches in results:
+        if isinstance(matches, dict):
+            continue
+        for match in matches:
+            if match["id"] not in merged or match["score"] > merged[match["id"]]["score"]:
+                merged[match["id"]] = match
+    if not merged and results and all(isinstance(matches, dict) for matches in results):
+        return results[0]
+    return sorted(merged.values(), key=lambda match: match["score"], reverse=True)[:top_k]
+
+async def query_async(query, filters, top_k=5):
+    """Async counterpart of the /query search: one embedding, then every filter searched at once."""
+    query_embedding = await get_runtime().call("embedding", embed_query, query)
+    return await retrieve_async(query, filters, top_k, query_embedding)
+
+async def answer_query_async(query, grade=None, subject=None, user_id=None):
+    """
+    Async counterpart of answer_query, running the same pipeline stages (see models/gemini.py)
+    with every upstream call on the event loop.
+    :param user_id: If given, the answer is logged to this user's history
+    :return: {"response": str, "timings": {stage: ms}, "rerank": status, "cached": bool,
+              "prompt_tokens": token counts (uncached answers only)}
+    """
+    runtime = get_runtime()
+    timings = {}
+    started = time.perf_counter()
+
+    stage = time.perf_counter()
+    query_embedding = await runtime.call("embedding", embed_query, query)
+    timings["embed_ms"] = elapsed_ms(stage)
+
+    prepared = find_similar_answer(query_embedding, grade, subject)
+    if prepared is None:
+        stage = time.perf_counter()
+        matches = await retrieve_async(query, [(grade, subject)], answer_retrieval_depth(), query_embedding)
+        if isinstance(matches, dict):
+            matches = []  # Retrieval failed; answer without context
+        timings["retrieve_ms"] = elapsed_ms(stage)
+
+        rerank_status = "disabled"
+        if RERANK_ENABLED and matches:
+            matches, rerank_status = await runtime.call("embedding", rerank_matches, query, matches, timings)
+        prepared = prepare_generation(query, grade, subject, matches, query_embedding, rerank_status)
+
+    if prepared["cached"] is not None:
+        result = answer_result(prepared, prepared["cached"], timings, started)
+    else:
+        stage = time.perf_counter()
+        response = await runtime.call("llm", get_llm().generate_content, prepared["prompt"])
+        timings["generate_ms"] = elapsed_ms(stage)
+        result = answer_result(prepared, response.text, timings, started)
+    return log_answer(user_id, query, result)
+
+async def generate_exam_async(grade, subject, num_questions=5, store=None):
+    """
+    Async counterpart of generate_exam. store(questions), if given, persists the exam in the
+    background once it has been generated.
+    """
+    runtime = get_runtime()
+    matches = await runtime.call("vector", exam_context, grade, subject)
+    prompt = format_exam_prompt(grade, subject, num_questions, matches)
+    response = await runtime.call("llm", get_llm().generate_content, prompt)
+
+    if store is not None:
+        runtime.spawn(runtime.call("mongo", store, response.text), "exam store")
+    return response.text
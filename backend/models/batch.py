@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import BATCH_LLM_WORKERS, BATCH_LLM_RATE, BATCH_LLM_RETRIES
+from models.gemini import get_llm, exam_context, format_exam_prompt, marking_prompt
+
+class RateLimiter:
+    """Token bucket shared by every batch in the worker, so a large batch can't trip Gemini's rate limits."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call may start."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+llm_rate_limiter = RateLimiter(BATCH_LLM_RATE)
+
+def _generate_with_retry(prompt, max_retries, backoff):
+    """Runs one Gemini call, retrying with exponential backoff."""
+    attempts = 0
+    while True:
+        attempts += 1
+        llm_rate_limiter.acquire()
+        try:
+            return get_llm().generate_content(prompt).text, attempts
+        except Exception as e:
+            if attempts > max_retries:
+                raise
+            logging.warning(f"⚠️ Batch generation failed (attempt {attempts}), retrying: {str(e)}")
+            time.sleep(backoff * 2 ** (attempts - 1))
+
+def run_llm_batch(prompts, max_workers=BATCH_LLM_WORKERS, max_retries=BATCH_LLM_RETRIES, backoff=1.0):
+    """
+    Sends prompts to Gemini through a bounded worker pool.
+    :return: iterator of (index, {"status": "ok", "text", "attempts"} or {"status": "error", "error"}),
+             in completion order
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            pool.submit(_generate_with_retry, prompt, max_retries, backoff): index
+            for index, prompt in enumerate(prompts)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                text, attempts = future.result()
+                yield index, {"status": "ok", "text": text, "attempts": attempts}
+            except Exception as e:
+                logging.error(f"❌ Batch item {index} failed: {str(e)}")
+                yield index, {"status": "error", "error": str(e)}
+    finally:
+        # Also runs on GeneratorExit when a streaming client disconnects: prompts not yet started are dropped
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def generate_exams_batch(specs, max_workers=BATCH_LLM_WORKERS):
+    """
+    Generates one exam per spec ({"grade", "subject", "numQuestions"}). Context is retrieved
+    once per (grade, subject) and shared by every exam for it.
+    :return: iterator of (index, result) as exams finish; see run_llm_batch
+    """
+    groups = sorted({(spec.get("grade"), spec["subject"]) for spec in specs}, key=str)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        contexts = dict(zip(groups, pool.map(lambda group: exam_context(*group), groups)))
+
+    prompts = [
+        format_exam_prompt(spec.get("grade"), spec["subject"], spec.get("numQuestions", 5),
+                           contexts[(spec.get("grade"), spec["subject"])])
+        for spec in specs
+    ]
+    return run_llm_batch(prompts, max_workers)
+
+def mark_exams_batch(sheets, max_workers=BATCH_LLM_WORKERS):
+    """
+    Marks many answer sheets ({"answers", "grade", "subject"}) in parallel.
+    :return: iterator of (index, result) as sheets finish; see run_llm_batch
+    """
+    prompts = [marking_prompt(sheet["answers"], sheet.get("grade"), sheet.get("subject")) for sheet in sheets]
+    return run_llm_batch(prompts, max_workers)
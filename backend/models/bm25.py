@@ -0,0 +1,211 @@
+import fcntl
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+from config import BM25_PATH
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "that", "the", "this", "to", "was", "what", "which", "with",
+}
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index over the same chunks stored in the vector store.
+    Chunks are keyed by their vector ID and carry grade/subject/filename so searches can be
+    filtered like vector queries. The index is pickled to disk on flush(); other workers pick
+    up the new file on their next search. Writes since the last flush are replayed on top of the
+    file if another worker saved it in the meantime, so concurrent uploads don't drop chunks.
+    The file is local to the host: with several hosts, each one only indexes the uploads it
+    handled, so BM25_PATH must point at shared storage (or be rebuilt per host) before enabling
+    HYBRID_SEARCH there.
+    """
+
+    def __init__(self, path=BM25_PATH, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_mtime = None
+        self._pending = []  # Writes since the last load/flush, replayed if another worker saved first
+        self._load()
+
+    def _reset(self):
+        self.docs = {}  # chunk_id -> {"length", "text", "grade", "subject", "filename", "chunk"}
+        self.postings = defaultdict(dict)  # term -> {chunk_id: term frequency}
+        self.by_file = defaultdict(set)  # filename -> chunk_ids
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with self._lock:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+            self._reset()
+            self.docs = saved["docs"]
+            self.postings = defaultdict(dict, saved["postings"])
+            self.by_file = defaultdict(set, saved["by_file"])
+            self.total_length = saved["total_length"]
+            self._loaded_mtime = os.path.getmtime(self.path)
+
+    def _reload_if_changed(self):
+        """Picks up an index file written by another worker."""
+        if self._pending or not self.path or not os.path.exists(self.path):
+            return
+        if os.path.getmtime(self.path) != self._loaded_mtime:
+            self._load()
+
+    def add(self, chunk_id, text, metadata):
+        with self._lock:
+            self._pending.append(("add", chunk_id, text, metadata))
+            self._add(chunk_id, text, metadata)
+
+    def _add(self, chunk_id, text, metadata):
+        if chunk_id in self.docs:
+            self._remove(chunk_id)
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self.docs[chunk_id] = {
+            "length": length,
+            "text": text,
+            "grade": metadata.get("grade"),
+            "subject": metadata.get("subject"),
+            "filename": metadata.get("filename"),
+            "chunk": metadata.get("chunk"),
+        }
+        for term, frequency in terms.items():
+            self.postings[term][chunk_id] = frequency
+        self.by_file[metadata.get("filename")].add(chunk_id)
+        self.total_length += length
+
+    def _remove(self, chunk_id):
+        doc = self.docs.pop(chunk_id)
+        for term in set(tokenize(doc["text"])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.by_file[doc["filename"]].discard(chunk_id)
+        self.total_length -= doc["length"]
+
+    def remove(self, chunk_ids):
+        """Drops individual chunks by ID."""
+        with self._lock:
+            chunk_ids = list(chunk_ids)
+            self._pending.append(("remove", chunk_ids))
+            self._remove_ids(chunk_ids)
+
+    def _remove_ids(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            if chunk_id in self.docs:
+                self._remove(chunk_id)
+
+    def remove_file(self, filename):
+        """Drops every chunk that came from the given file."""
+        with self._lock:
+            self._pending.append(("remove_file", filename))
+            return self._remove_file(filename)
+
+    def _remove_file(self, filename):
+        chunk_ids = self.by_file.pop(filename, set())
+        for chunk_id in list(chunk_ids):
+            if chunk_id in self.docs:
+                self._remove(chunk_id)
+        self.by_file.pop(filename, None)
+        return len(chunk_ids)
+
+    def search(self, query, top_k=10, filter=None):
+        """
+        Scores chunks against the query with BM25.
+        :param filter: Optional {"grade": ..., "subject": ..., "filename": ...} equality filter
+        :return: [(chunk_id, score)] best first
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if not self.docs:
+                return []
+
+            count = len(self.docs)
+            average_length = self.total_length / count or 1.0
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    length = self.docs[chunk_id]["length"]
+                    norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[chunk_id] += idf * frequency * (self.k1 + 1) / norm
+
+            if filter:
+                scores = {
+                    chunk_id: score for chunk_id, score in scores.items()
+                    if all(self.docs[chunk_id].get(field) == value for field, value in filter.items())
+                }
+            return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def get(self, chunk_id):
+        with self._lock:
+            return self.docs.get(chunk_id)
+
+    def flush(self):
+        """Writes the index to disk (atomically) if it changed."""
+        with self._lock:
+            if not self._pending or not self.path:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # One writer at a time across workers
+
+                if os.path.exists(self.path) and os.path.getmtime(self.path) != self._loaded_mtime:
+                    # Another worker saved first: start from its file and replay our writes
+                    pending = self._pending
+                    self._load()
+                    for op in pending:
+                        if op[0] == "add":
+                            self._add(*op[1:])
+                        elif op[0] == "remove":
+                            self._remove_ids(op[1])
+                        else:
+                            self._remove_file(op[1])
+
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump({
+                        "docs": self.docs,
+                        "postings": dict(self.postings),
+                        "by_file": dict(self.by_file),
+                        "total_length": self.total_length,
+                    }, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path)
+                self._loaded_mtime = os.path.getmtime(self.path)
+                self._pending = []
+            logging.info(f"✅ Saved BM25 index with {len(self.docs)} chunks.")
+
+_bm25_index = None
+_bm25_lock = threading.Lock()
+
+def get_bm25_index():
+    """Returns the worker's BM25 index, loading it from disk on first use."""
+    global _bm25_index
+    if _bm25_index is None:
+        with _bm25_lock:
+            if _bm25_index is None:
+                _bm25_index = BM25Index()
+    return _bm25_index
@@ -101,11 +101,15 @@
 #         "pinecone_matches": pinecone_matches
 #     })
 
+import atexit
+import datetime
 from pymongo import MongoClient
 from config import MONGO_URI
+from models.metrics import track
+from models.write_buffer import WriteBehindBuffer
 
-# MongoDB Connection
-client = MongoClient(MONGO_URI)
+# MongoDB Connection (connect=False defers the first network round trip to the first query)
+client = MongoClient(MONGO_URI, connect=False)
 db = client["education_ai"]
 
 # Collections
@@ -117,6 +121,12 @@ pdf_uploads = db["pdf_uploads"]
 history = db["history"]
 feedback = db["feedback"]  # ✅ Collection for AI refinement and user feedback
 exams = db["exams"]  # ✅ Collection for storing exams
+question_bank = db["question_bank"]  # ✅ Parsed, deduplicated exam questions
+sessions = db["sessions"]  # ✅ Issued login tokens, expired by a TTL index
+
+# History, feedback and exam logs are written behind the request, in batches
+log_writer = WriteBehindBuffer()
+atexit.register(log_writer.close)
 
 # 📝 Register Users
 def register_user(user_type, user_data):
@@ -136,24 +146,82 @@ def register_user(user_type, user_data):
     else:
         raise ValueError("Invalid user type")
 
-# 📂 Store PDF Metadata (Admins Upload)
-def save_pdf_metadata(admin_id, filename, grade, subject, chunk_count):
+# ⏳ Track PDF Ingestion Jobs (stored alongside the upload metadata)
+def create_upload_job(job_id, admin_id, filename, grade, subject):
     """
-    Stores metadata about an uploaded PDF, linking it to an admin.
+    Records a queued ingestion job as a pending pdf_uploads entry.
+    :param job_id: Unique ID returned to the client for status polling
     :param admin_id: The ID of the admin uploading the PDF
     :param filename: Name of the uploaded file
     :param grade: Grade level associated with the document
     :param subject: Subject of the document
-    :param chunk_count: Number of text chunks stored in Pinecone
     """
-    pdf_uploads.insert_one({
-        "admin_id": admin_id,
-        "filename": filename,
-        "grade": grade,
-        "subject": subject,
-        "chunk_count": chunk_count,
-        "status": "active"  # Can later be updated to "archived" or "updated"
-    })
+    with track("mongo_insert"):
+        pdf_uploads.insert_one({
+            "job_id": job_id,
+            "admin_id": admin_id,
+            "filename": filename,
+            "grade": grade,
+            "subject": subject,
+            "chunk_count": 0,
+            "status": "processing",  # Becomes "active" once ingestion finishes, or "failed"
+            "stage": "queued",
+            "chunks_done": 0,
+            "chunks_total": None,
+            "error": None,
+            "created_at": datetime.datetime.utcnow()
+        })
+
+def update_upload_job(job_id, **fields):
+    """
+    Updates fields (stage, status, error, ...) on an ingestion job.
+    :param job_id: The job to update
+    """
+    fields["updated_at"] = datetime.datetime.utcnow()
+    pdf_uploads.update_one({"job_id": job_id}, {"$set": fields})
+
+def increment_upload_progress(job_id, chunks_done):
+    """
+    Adds newly stored chunks to an ingestion job's progress counter.
+    :param job_id: The job to update
+    :param chunks_done: Number of chunks stored since the last update
+    """
+    pdf_uploads.update_one({"job_id": job_id}, {"$inc": {"chunks_done": chunks_done}})
+
+def get_chunk_manifest(filename):
+    """
+    Fetches the active upload of a file with the chunk IDs stored for it, or None if it was never uploaded.
+    "manifest" is missing for files ingested before manifests were tracked.
+    :param filename: Name of the uploaded file
+    """
+    return pdf_uploads.find_one(
+        {"filename": filename, "status": "active"},
+        {"_id": 0, "job_id": 1, "grade": 1, "subject": 1, "manifest": 1},
+        sort=[("_id", -1)]
+    )
+
+def retire_previous_uploads(filename, job_id):
+    """
+    Marks earlier uploads of a file as replaced once a new upload of it has finished.
+    :param filename: Name of the uploaded file
+    :param job_id: The upload that replaces them
+    """
+    pdf_uploads.update_many(
+        {"filename": filename, "status": "active", "job_id": {"$ne": job_id}},
+        {"$set": {"status": "updated", "updated_at": datetime.datetime.utcnow()}, "$unset": {"manifest": ""}}
+    )
+
+def get_upload_job(job_id):
+    """
+    Fetches the status fields of an ingestion job, or None if it does not exist.
+    :param job_id: The job to look up
+    """
+    with track("mongo_find"):
+        return pdf_uploads.find_one(
+            {"job_id": job_id},
+            {"_id": 0, "job_id": 1, "filename": 1, "status": 1, "stage": 1,
+             "chunks_done": 1, "chunks_total": 1, "changes": 1, "error": 1}
+        )
 
 # 📌 Store Teacher Feedback on AI Content
 def store_teacher_feedback(teacher_id, query, ai_response, correct_response, rating):
@@ -165,7 +233,7 @@ def store_teacher_feedback(teacher_id, query, ai_response, correct_response, rat
     :param correct_response: The teacher's suggested correct response
     :param rating: A score (1-5) indicating AI accuracy
     """
-    feedback.insert_one({
+    log_writer.put(feedback, {
         "teacher_id": teacher_id,
         "query": query,
         "ai_response": ai_response,
@@ -182,7 +250,7 @@ def store_parent_feedback(parent_id, student_id, observation, recommendation):
     :param observation: Notes on child behavior or struggles
     :param recommendation: Parent’s suggestion for improving learning
     """
-    feedback.insert_one({
+    log_writer.put(feedback, {
         "parent_id": parent_id,
         "student_id": student_id,
         "observation": observation,
@@ -198,27 +266,47 @@ def save_user_query(user_id, query, response, pinecone_matches):
     :param response: AI-generated response
     :param pinecone_matches: Relevant text chunks retrieved from Pinecone
     """
-    history.insert_one({
+    log_writer.put(history, {
         "user_id": user_id,
         "query": query,
         "response": response,
-        "pinecone_matches": pinecone_matches
+        "pinecone_matches": pinecone_matches,
+        "created_at": datetime.datetime.utcnow()
     })
 
 # 📘 Store Generated Exam Questions
-def store_exam(subject, difficulty, questions):
+def store_exam(subject, difficulty, questions, grade=None):
     """
     Stores generated exam questions in MongoDB.
     :param subject: Subject of the exam
     :param difficulty: Difficulty level
     :param questions: List of questions generated
+    :param grade: Grade the exam was generated for
     """
-    exams.insert_one({
+    log_writer.put(exams, {
+        "grade": grade,
         "subject": subject,
         "difficulty": difficulty,
         "questions": questions
     })
 
+# ✅ Store Exam Marking Results
+def store_exam_marking(grade, subject, answers, marking):
+    """
+    Stores AI marking feedback for a student's answers in MongoDB.
+    :param grade: Grade level of the exam
+    :param subject: Subject of the exam
+    :param answers: The student's submitted answers
+    :param marking: The generated marking scheme, scores and feedback
+    """
+    log_writer.put(exams, {
+        "type": "marking",
+        "grade": grade,
+        "subject": subject,
+        "answers": answers,
+        "marking": marking
+    })
+
 # 📝 Store General User Feedback
 def store_feedback(user_type, rating, comment):
     """
@@ -227,8 +315,48 @@ def store_feedback(user_type, rating, comment):
     :param rating: Numerical rating (e.g., 1-5)
     :param comment: Text feedback provided by the user
     """
-    feedback.insert_one({
+    log_writer.put(feedback, {
         "user_type": user_type,
         "rating": rating,
         "comment": comment
     })
+
+# 🏦 Question Bank
+def store_bank_questions(items):
+    """
+    Adds parsed exam questions to the question bank.
+    :param items: Dicts with grade, subject, difficulty, question, options, type and embedding
+    """
+    if not items:
+        return
+    now = datetime.datetime.utcnow()
+    with track("mongo_insert_many", batch_size=len(items)):
+        question_bank.insert_many([{**item, "created_at": now} for item in items])
+
+def load_bank_questions(grade, subject):
+    """
+    Loads every bank question for a grade and subject.
+    :param grade: Grade level
+    :param subject: Subject name
+    """
+    with track("mongo_find"):
+        return list(question_bank.find(
+            {"grade": grade, "subject": subject},
+            {"_id": 0, "difficulty": 1, "question": 1, "options": 1, "type": 1, "embedding": 1}
+        ))
+
+def count_bank_questions(grade, subject):
+    """
+    Counts the bank questions for a grade and subject, so workers can tell when their cached copy is stale.
+    :param grade: Grade level
+    :param subject: Subject name
+    """
+    with track("mongo_count"):
+        return question_bank.count_documents({"grade": grade, "subject": subject})
+
+def load_past_exams():
+    """Returns stored exam generations (not marking results) for seeding the question bank."""
+    return list(exams.find(
+        {"type": {"$ne": "marking"}, "questions": {"$type": "string"}},
+        {"_id": 0, "grade": 1, "subject": 1, "difficulty": 1, "questions": 1}
+    ))
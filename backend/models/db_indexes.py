@@ -0,0 +1,139 @@
+"""
+Declares the indexes each Mongo collection needs, creates any that are missing, and explains
+the app's hot query shapes to flag ones that still fall back to a collection scan.
+
+Usage (from backend/):
+    python -m models.db_indexes
+"""
+import logging
+from models.database import db
+
+ASCENDING, DESCENDING = 1, -1
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "students": [([("email", ASCENDING)], {"unique": True})],
+    "teachers": [([("email", ASCENDING)], {"unique": True})],
+    "parents": [([("email", ASCENDING)], {"unique": True})],
+    "admins": [([("email", ASCENDING)], {"unique": True})],
+    "pdf_uploads": [
+        ([("filename", ASCENDING), ("status", ASCENDING)], {}),
+        ([("job_id", ASCENDING)], {"unique": True, "sparse": True}),
+        ([("grade", ASCENDING), ("subject", ASCENDING)], {}),
+    ],
+    "history": [([("user_id", ASCENDING), ("created_at", DESCENDING)], {})],
+    "exams": [([("grade", ASCENDING), ("subject", ASCENDING)], {})],
+    "question_bank": [([("grade", ASCENDING), ("subject", ASCENDING)], {})],
+    "sessions": [
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),  # TTL: Mongo deletes sessions once they expire
+        ([("email", ASCENDING)], {}),
+    ],
+}
+
+# Query shapes issued on request paths: (collection, filter, projection)
+HOT_QUERIES = [
+    ("students", {"email": "probe@example.com"}, {"email": 1, "password": 1, "fullName": 1}),
+    ("teachers", {"email": "probe@example.com"}, {"email": 1, "password": 1, "fullName": 1}),
+    ("parents", {"email": "probe@example.com"}, {"email": 1, "password": 1, "fullName": 1}),
+    ("admins", {"email": "probe@example.com"}, {"password": 1}),
+    ("pdf_uploads", {"filename": "probe.pdf"}, {"_id": 1}),
+    ("pdf_uploads", {"filename": "probe.pdf", "status": "active"}, {"manifest": 1}),
+    ("pdf_uploads", {"job_id": "probe"}, {"_id": 0, "status": 1}),
+    ("history", {"user_id": "probe@example.com"}, {"_id": 0, "query": 1}),
+    ("question_bank", {"grade": "5", "subject": "probe"}, {"_id": 0, "question": 1}),
+    ("sessions", {"email": "probe@example.com"}, {"_id": 1}),
+]
+
+COMPARED_OPTIONS = {"unique": False, "sparse": False, "expireAfterSeconds": None}  # option -> Mongo's default
+
+def index_name(keys):
+    """The name Mongo gives an index by default, e.g. "grade_1_subject_1"."""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+def option_differences(declared, existing):
+    """Lists the options (unique, sparse, TTL) in which an existing index differs from its declaration."""
+    return [
+        f"{option}={existing.get(option, default)!r}, expected {declared.get(option, default)!r}"
+        for option, default in COMPARED_OPTIONS.items()
+        if existing.get(option, default) != declared.get(option, default)
+    ]
+
+def ensure_indexes():
+    """
+    Creates any missing declared index and verifies every one exists afterwards. An existing index
+    whose unique, sparse or TTL option differs from its declaration is reported, not rebuilt, since
+    dropping it (e.g. a unique index) needs a human decision.
+    A failure (e.g. duplicate emails blocking a unique index) is logged and reported, not raised.
+    :return: {collection: {index name: "ok" | "created" | "error: ..."}}
+    """
+    report = {}
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        results = report.setdefault(collection_name, {})
+        for keys, options in specs:
+            name = index_name(keys)
+            if name in existing:
+                differences = option_differences(options, existing[name])
+                if differences:
+                    results[name] = f"error: options differ ({'; '.join(differences)})"
+                    logging.error(f"❌ Index {collection_name}.{name} options differ: {'; '.join(differences)}")
+                else:
+                    results[name] = "ok"
+                continue
+            try:
+                collection.create_index(keys, name=name, **options)
+                results[name] = "created"
+                logging.info(f"✅ Created index {collection_name}.{name}")
+            except Exception as e:
+                results[name] = f"error: {str(e)}"
+                logging.error(f"❌ Could not create index {collection_name}.{name}: {str(e)}")
+
+        existing = collection.index_information()
+        for name, status in results.items():
+            if not status.startswith("error") and name not in existing:
+                results[name] = "error: missing after create"
+    return report
+
+def _plan_stages(plan):
+    """Yields every stage name in an explain() plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+def explain_hot_queries():
+    """
+    Explains each hot query shape and reports its winning plan.
+    :return: [{"collection", "filter", "stages", "collscan": bool}]
+    """
+    report = []
+    for collection_name, query_filter, projection in HOT_QUERIES:
+        try:
+            explained = db[collection_name].find(query_filter, projection).limit(1).explain()
+            stages = list(_plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {})))
+            entry = {"collection": collection_name, "filter": sorted(query_filter), "stages": stages,
+                     "collscan": "COLLSCAN" in stages}
+        except Exception as e:
+            entry = {"collection": collection_name, "filter": sorted(query_filter), "error": str(e), "collscan": None}
+        if entry["collscan"]:
+            logging.warning(f"⚠️ {collection_name} query on {entry['filter']} is a COLLSCAN")
+        report.append(entry)
+    return report
+
+def main():
+    for collection_name, results in ensure_indexes().items():
+        for name, status in results.items():
+            print(f"{collection_name:<14} {name:<32} {status}")
+    print()
+    for entry in explain_hot_queries():
+        plan = " > ".join(entry.get("stages", [])) or entry.get("error")
+        flag = "COLLSCAN ⚠️" if entry["collscan"] else "ok"
+        print(f"{entry['collection']:<14} {','.join(entry['filter']):<24} {flag:<12} {plan}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,191 @@
-from sentence_transformers import SentenceTransformer
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import EMBED_BATCH_SIZE, QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_PATH, QUERY_CACHE_SHARED_SIZE
+from models.metrics import track
 
-embed_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+_embed_model = None
+_embed_model_lock = threading.Lock()
+
+def get_embed_model():
+    """Loads the SentenceTransformer model on first use (importing torch alone takes seconds)."""
+    global _embed_model
+    if _embed_model is None:
+        with _embed_model_lock:
+            if _embed_model is None:
+                from sentence_transformers import SentenceTransformer
+                _embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+    return _embed_model
 
 def generate_embedding(text):
-    return embed_model.encode(text).tolist()
+    embed_model = get_embed_model()
+    with track("embed", batch_size=1):
+        return embed_model.encode(text).tolist()
+
+def generate_embeddings(texts, batch_size=EMBED_BATCH_SIZE, normalize=False):
+    """
+    Encodes many texts in batched forward passes.
+    :param texts: List of strings to embed
+    :param batch_size: Number of texts per forward pass
+    :param normalize: L2-normalize each row (cosine-ready vectors)
+    :return: C-contiguous float32 matrix of shape (len(texts), dimension)
+    """
+    embed_model = get_embed_model()
+    if not texts:
+        dimension = embed_model.get_sentence_embedding_dimension()
+        return np.empty((0, dimension), dtype=np.float32)
+
+    with track("embed", batch_size=len(texts)):
+        embeddings = embed_model.encode(
+            list(texts),
+            batch_size=batch_size,
+            normalize_embeddings=normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+def normalize_query(text):
+    """Normalizes query text for cache lookups (case and whitespace insensitive)."""
+    return " ".join(text.lower().split())
+
+class SQLiteEmbeddingStore:
+    """
+    File-backed embedding store that several Gunicorn workers on one host can share.
+    Every prune_every puts, expired rows are purged and the oldest rows beyond max_rows are dropped.
+    """
+
+    def __init__(self, path, max_rows=QUERY_CACHE_SHARED_SIZE, prune_every=100):
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, expires_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or (row[1] is not None and row[1] < time.time()):
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def put(self, key, vector, expires_at):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, expires_at) VALUES (?, ?, ?)",
+                (key, blob, expires_at)
+            )
+            self._puts += 1
+            if self._puts % self.prune_every == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        self._conn.execute("DELETE FROM query_embeddings WHERE expires_at <= ?", (time.time(),))
+        # INSERT OR REPLACE gives a row a new rowid, so the lowest rowids are the least recently stored
+        self._conn.execute(
+            "DELETE FROM query_embeddings WHERE rowid NOT IN "
+            "(SELECT rowid FROM query_embeddings ORDER BY rowid DESC LIMIT ?)",
+            (self.max_rows,)
+        )
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with an optional TTL and an optional shared backend.
+    Keys combine the model name with the normalized query text.
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, shared_path=QUERY_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self._entries = OrderedDict()  # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+        self._shared = SQLiteEmbeddingStore(shared_path) if shared_path else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(text, model_name=EMBED_MODEL_NAME):
+        return f"{model_name}:{normalize_query(text)}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                expires_at, vector = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+                self.expirations += 1
+
+        if self._shared:
+            vector = self._shared.get(key)
+            if vector is not None:
+                self._store_local(key, vector)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, vector):
+        self._store_local(key, vector)
+        if self._shared:
+            self._shared.put(key, vector, self._expires_at())
+
+    def _expires_at(self):
+        return time.time() + self.ttl if self.ttl else None
+
+    def _store_local(self, key, vector):
+        with self._lock:
+            self._entries[key] = (self._expires_at(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Returns hit/miss/eviction counters and the current hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+query_cache = QueryEmbeddingCache()
+
+def embed_query(text):
+    """Embeds a search query, reusing cached embeddings for repeated questions."""
+    key = QueryEmbeddingCache.make_key(text)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = generate_embedding(text)
+        query_cache.put(key, vector)
+    return vector
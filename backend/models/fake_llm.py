@@ -0,0 +1,34 @@
+import time
+from config import FAKE_LLM_DELAY_MS
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeLLM:
+    """
+    Offline stand-in for genai.GenerativeModel (LLM_BACKEND=fake).
+    Returns a deterministic reply derived from the prompt and, with stream=True, yields it
+    word by word with a configurable delay so streaming and time-to-first-byte can be tested.
+    """
+
+    def __init__(self, delay_ms=FAKE_LLM_DELAY_MS):
+        self.delay_ms = delay_ms
+        self.calls = 0
+
+    def _reply(self, prompt):
+        last_line = next((line.strip() for line in reversed(prompt.strip().splitlines()) if line.strip()), "")
+        return f"[fake-llm] Response to: {last_line[:200]}"
+
+    def _stream(self, text):
+        for i, word in enumerate(text.split(" ")):
+            time.sleep(self.delay_ms / 1000.0)
+            yield FakeResponse(word if i == 0 else f" {word}")
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        text = self._reply(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.delay_ms / 1000.0)
+        return FakeResponse(text)
@@ -58,57 +58,254 @@
 #     response = llm.generate_content(prompt)
     
 #     return response.text
-import google.generativeai as genai
-from config import GENAI_API_KEY
+import threading
+import time
+from config import (
+    GENAI_API_KEY, LLM_BACKEND, RERANK_ENABLED, RERANK_CANDIDATES, PROMPT_TOKEN_BUDGET_ANSWER, PROMPT_TOKEN_BUDGET_EXAM,
+)
+from models.embedding import embed_query
+from models.metrics import track, tracked_iterator
+from models.prompt_builder import build_prompt
+from models.rerank import rerank
+from models.response_cache import response_cache
+from models.single_flight import answer_flight
 
-# Configure Gemini API
-genai.configure(api_key=GENAI_API_KEY)
-llm = genai.GenerativeModel("gemini-2.0-flash")
+_llm = None
+_llm_lock = threading.Lock()
 
-def generate_response(query, grade=None, subject=None):
-    """Generates a response using RAG to ensure accuracy and relevance."""
-    from models.rag import search_pinecone  # ✅ Import here to prevent circular import
+class InstrumentedLLM:
+    """Wraps the model so every generate_content call is timed as an "llm_generate" (or "llm_stream") stage."""
+
+    def __init__(self, model):
+        self._model = model
+
+    def generate_content(self, prompt, *args, stream=False, **kwargs):
+        if stream:
+            return tracked_iterator("llm_stream", self._model.generate_content(prompt, *args, stream=True, **kwargs))
+        with track("llm_generate"):
+            return self._model.generate_content(prompt, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+def get_llm():
+    """Configures the Gemini API (or the offline fake) and creates the model on first use."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                if LLM_BACKEND == "fake":
+                    from models.fake_llm import FakeLLM
+                    _llm = InstrumentedLLM(FakeLLM())
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GENAI_API_KEY)
+                    _llm = InstrumentedLLM(genai.GenerativeModel("gemini-2.0-flash"))
+    return _llm
+
+def stream_generation(prompt):
+    """Yields response text pieces as Gemini streams them back."""
+    for chunk in get_llm().generate_content(prompt, stream=True):
+        text = getattr(chunk, "text", "")
+        if text:
+            yield text
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+# Answer pipeline stages, shared by the sync (answer_query, stream_answer) and async (models/async_rag.py) paths
+
+def answer_prompt(query, matches):
+    """:return: (prompt, token counts) with the retrieved context compressed to the answer token budget"""
+    def render(context):
+        # If relevant content is found, use it in the prompt
+        if context:
+            return f"Based on the following learning materials, answer this query accurately:\n\n{context}\n\nQuery: {query}"
+        return f"Explain this topic in detail: {query}"
+
+    return build_prompt("answer", matches, PROMPT_TOKEN_BUDGET_ANSWER, render)
+
+def answer_retrieval_depth():
+    """Matches to retrieve for an answer; over-fetches when a rerank stage follows."""
+    return RERANK_CANDIDATES if RERANK_ENABLED else 5
+
+def find_similar_answer(query_embedding, grade, subject):
+    """
+    Semantic cache: a near-identical question with the same filters reuses the cached answer.
+    :return: A prepared answer (see prepare_generation) holding the cached text, or None
+    """
+    cached = response_cache.get_similar(query_embedding, grade, subject)
+    if cached is None:
+        return None
+    return {"cached": cached, "matches": [], "rerank": "skipped"}
+
+def rerank_matches(query, matches, timings):
+    """
+    Reranks retrieved matches when RERANK_ENABLED, recording rerank_ms in timings.
+    :return: (matches, rerank status)
+    """
+    if not (RERANK_ENABLED and matches):
+        return matches, "disabled"
+    matches, rerank_info = rerank(query, matches)
+    timings["rerank_ms"] = round(rerank_info["rerank_ms"], 2)
+    return matches, rerank_info["status"]
+
+def prepare_generation(query, grade, subject, matches, query_embedding, rerank_status):
+    """
+    Checks the response cache for this query and context, and otherwise builds the prompt.
+    :return: dict with "cached" (answer or None), "prompt", "prompt_tokens", "matches", "cache_key", "query_embedding", "rerank"
+    """
+    cache_key = response_cache.make_key(query, grade, subject, [match["id"] for match in matches])
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return {"cached": cached, "matches": matches, "rerank": rerank_status}
+
+    prompt, prompt_tokens = answer_prompt(query, matches)
+    return {
+        "cached": None,
+        "prompt": prompt,
+        "prompt_tokens": prompt_tokens,
+        "matches": matches,
+        "cache_key": cache_key,
+        "query_embedding": query_embedding,
+        "rerank": rerank_status,
+    }
+
+def cache_answer(prepared, text):
+    response_cache.put(
+        prepared["cache_key"], text, embedding=prepared["query_embedding"],
+        filenames=[match["filename"] for match in prepared["matches"] if match.get("filename")]
+    )
+
+def answer_result(prepared, text, timings, started):
+    """
+    Caches a freshly generated answer and builds the answer_query result. Its "context" (the
+    retrieved chunk texts) is for log_answer and is removed before the result is returned.
+    """
+    timings["total_ms"] = elapsed_ms(started)
+    result = {
+        "response": text, "timings": timings, "rerank": prepared["rerank"], "cached": prepared["cached"] is not None,
+        "context": [match["text"] for match in prepared["matches"]],
+    }
+    if prepared["cached"] is None:
+        cache_answer(prepared, text)
+        result["prompt_tokens"] = prepared["prompt_tokens"]
+    return result
+
+def log_answer(user_id, query, result):
+    """Takes the context out of an answer result and, if user_id is given, logs the answer to the user's history."""
+    result = dict(result)
+    context = result.pop("context")
+    if user_id:
+        from models.database import save_user_query  # Buffered write; never waits on Mongo
+        save_user_query(user_id, query, result["response"], context)
+    return result
+
+def _prepare_answer(query, grade, subject, timings):
+    """Runs every answer stage before generation: embedding, cache lookups, retrieval and rerank."""
+    from models.rag import search_pinecone_matches  # ✅ Import here to prevent circular import
+
+    stage = time.perf_counter()
+    query_embedding = embed_query(query)
+    timings["embed_ms"] = elapsed_ms(stage)
+
+    prepared = find_similar_answer(query_embedding, grade, subject)
+    if prepared is not None:
+        return prepared
 
     # Retrieve relevant knowledge from Pinecone (RAG)
-    retrieved_docs = search_pinecone(query, grade, subject, top_k=5)
+    stage = time.perf_counter()
+    matches = search_pinecone_matches(query, grade, subject, top_k=answer_retrieval_depth(), query_embedding=query_embedding)
+    if isinstance(matches, dict):
+        matches = []  # Retrieval failed; answer without context
+    timings["retrieve_ms"] = elapsed_ms(stage)
 
-    # If relevant content is found, use it in the prompt
-    if retrieved_docs:
-        context = "\n".join(retrieved_docs)
-        prompt = f"Based on the following learning materials, answer this query accurately:\n\n{context}\n\nQuery: {query}"
-    else:
-        prompt = f"Explain this topic in detail: {query}"
+    matches, rerank_status = rerank_matches(query, matches, timings)
+    return prepare_generation(query, grade, subject, matches, query_embedding, rerank_status)
+
+def answer_query(query, grade=None, subject=None, user_id=None):
+    """
+    Answers a query with RAG and reports how long each stage took. Identical queries that arrive
+    while one is already being answered wait for it and share its answer.
+    :param user_id: If given, the answer is logged to this user's history
+    :return: {"response": str, "timings": {stage: ms}, "rerank": status, "cached": bool, "coalesced": bool,
+              "prompt_tokens": token counts (uncached answers only)}
+    """
+    key = answer_flight.make_key(query, grade, subject)
+    result, shared = answer_flight.do(key, lambda: _answer_query(query, grade, subject))
+    return log_answer(user_id, query, {**result, "coalesced": shared})
+
+def _answer_query(query, grade, subject):
+    timings = {}
+    started = time.perf_counter()
+    prepared = _prepare_answer(query, grade, subject, timings)
+    if prepared["cached"] is not None:
+        return answer_result(prepared, prepared["cached"], timings, started)
 
     # Generate response using Gemini
-    response = llm.generate_content(prompt)
+    stage = time.perf_counter()
+    response = get_llm().generate_content(prepared["prompt"])
+    timings["generate_ms"] = elapsed_ms(stage)
+    return answer_result(prepared, response.text, timings, started)
 
-    return response.text
+def stream_answer(query, grade=None, subject=None):
+    """
+    Streaming variant of answer_query.
+    :return: (retrieved matches, iterator of response text pieces). The full answer is cached once the iterator finishes.
+    """
+    prepared = _prepare_answer(query, grade, subject, {})
+    if prepared["cached"] is not None:
+        return prepared["matches"], iter([prepared["cached"]])
 
-def generate_exam(grade, subject, num_questions=5):
-    """Generates an exam with structured questions based on retrieved content."""
-    from models.rag import search_pinecone  # ✅ Import here to prevent circular import
+    def pieces():
+        parts = []
+        for text in stream_generation(prepared["prompt"]):
+            parts.append(text)
+            yield text
+        cache_answer(prepared, "".join(parts))
 
+    return prepared["matches"], pieces()
+
+def generate_response(query, grade=None, subject=None):
+    """Generates a response using RAG to ensure accuracy and relevance."""
+    return answer_query(query, grade, subject)["response"]
+
+def exam_prompt(grade, subject, num_questions):
     # Retrieve relevant content for the subject and grade
-    retrieved_docs = search_pinecone(f"Exam questions for {subject} in grade {grade}", grade, subject, top_k=5)
+    return format_exam_prompt(grade, subject, num_questions, exam_context(grade, subject))
+
+def exam_context_query(grade, subject):
+    return f"Exam questions for {subject} in grade {grade}"
 
-    context = "\n".join(retrieved_docs) if retrieved_docs else ""
+def exam_context(grade, subject):
+    """Retrieves learning materials for an exam; an empty list if retrieval fails."""
+    from models.rag import search_pinecone_matches  # ✅ Import here to prevent circular import
 
-    prompt = f"""
+    matches = search_pinecone_matches(exam_context_query(grade, subject), grade, subject, top_k=5)
+    return matches if isinstance(matches, list) else []
+
+def format_exam_prompt(grade, subject, num_questions, matches):
+    prompt, _ = build_prompt("exam", matches, PROMPT_TOKEN_BUDGET_EXAM, lambda context: f"""
     Generate {num_questions} exam questions for {subject} in Grade {grade}.
     Questions should be relevant and structured as multiple-choice and short-answer.
     Use the following learning materials if available:
     
     {context}
-    """
+    """)
+    return prompt
 
-    response = llm.generate_content(prompt)
+def generate_exam(grade, subject, num_questions=5):
+    """Generates an exam with structured questions based on retrieved content."""
+    response = get_llm().generate_content(exam_prompt(grade, subject, num_questions))
 
     return response.text
 
-def mark_exam(answers, grade, subject):
-    """Evaluates student answers, assigns scores, and provides feedback."""
-    
-    prompt = f"""
+def stream_exam(grade, subject, num_questions=5):
+    """Streams an exam's text as Gemini generates it."""
+    return stream_generation(exam_prompt(grade, subject, num_questions))
+
+def marking_prompt(answers, grade, subject):
+    return f"""
     Evaluate the following student answers based on standard curriculum for Grade {grade} {subject}.
     Provide a detailed marking scheme, scores, and constructive feedback.
     
@@ -116,6 +313,12 @@ def mark_exam(answers, grade, subject):
     {answers}
     """
 
-    response = llm.generate_content(prompt)
+def mark_exam(answers, grade, subject):
+    """Evaluates student answers, assigns scores, and provides feedback."""
+    response = get_llm().generate_content(marking_prompt(answers, grade, subject))
 
     return response.text
+
+def stream_marking(answers, grade, subject):
+    """Streams marking feedback as Gemini generates it."""
+    return stream_generation(marking_prompt(answers, grade, subject))
@@ -0,0 +1,241 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import fitz  # PyMuPDF
+from config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, INGEST_BACKEND, INGEST_WORKERS, UPLOAD_TMP_DIR,
+    PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_SHARD_PAGES,
+)
+from models.database import (
+    create_upload_job, update_upload_job, increment_upload_progress, get_upload_job, get_chunk_manifest,
+    retire_previous_uploads,
+)
+from models.rag import store_chunk_stream, delete_from_pinecone
+
+# 📝 Stream text out of a PDF one page at a time
+def _extract_page_range(path, start, stop):
+    """Extracts the non-empty page texts in [start, stop). Runs in a worker process, which opens the PDF by path."""
+    with fitz.open(path) as doc:
+        texts = (doc[page_number].get_text("text") for page_number in range(start, stop))
+        return [text for text in texts if text.strip()]
+
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def get_extract_pool(workers=PDF_EXTRACT_WORKERS):
+    """
+    Returns the process pool shared by every ingestion job, creating it on first use with the given
+    number of workers (later calls share that pool whatever they pass).
+    Workers are started with "spawn": this process already runs torch and other thread pools,
+    and forking it can leave a child holding a lock no thread will ever release.
+    """
+    global _extract_pool
+    if _extract_pool is None:
+        with _extract_pool_lock:
+            if _extract_pool is None:
+                _extract_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _extract_pool
+
+def _reset_extract_pool(broken):
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is broken:
+            _extract_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _iter_shards(pool, path, first_page, page_count, workers, shard_pages):
+    """Shards page ranges across the pool and yields (page texts, next page) back in document order."""
+    pending = deque()
+    try:
+        for start in range(first_page, page_count, shard_pages):
+            # Keep a bounded window of shards in flight so extracted text doesn't pile up ahead of embedding
+            if len(pending) >= workers * 2:
+                future, stop = pending.popleft()
+                yield future.result(), stop
+            stop = min(start + shard_pages, page_count)
+            pending.append((pool.submit(_extract_page_range, path, start, stop), stop))
+        while pending:
+            future, stop = pending.popleft()
+            yield future.result(), stop
+    finally:
+        for future, _ in pending:
+            future.cancel()  # The job stopped early; don't leave its shards queued on the shared pool
+
+def _iter_page_texts_parallel(path, page_count, workers, shard_pages):
+    """
+    Yields page texts extracted on the shared pool. If a pool process dies (e.g. OOM-killed), the pool
+    is replaced and extraction resumes from the first page not yet yielded; if the new pool breaks
+    too, the remaining pages are extracted in this process.
+    """
+    next_page = 0
+    for attempt in range(2):
+        pool = get_extract_pool(workers)
+        try:
+            for texts, next_shard in _iter_shards(pool, path, next_page, page_count, workers, shard_pages):
+                yield from texts
+                next_page = next_shard
+            return
+        except BrokenProcessPool:
+            _reset_extract_pool(pool)
+            if not attempt:
+                logging.warning(f"⚠️ PDF extraction pool broke at page {next_page}; starting a new one and retrying.")
+
+    logging.warning(f"⚠️ PDF extraction pool broke again; extracting pages {next_page}+ in this process.")
+    with fitz.open(path) as doc:
+        for page_number in range(next_page, page_count):
+            text = doc[page_number].get_text("text")
+            if text.strip():
+                yield text
+
+def iter_page_texts(path, workers=PDF_EXTRACT_WORKERS, min_parallel_pages=PDF_PARALLEL_MIN_PAGES,
+                    shard_pages=PDF_SHARD_PAGES):
+    """
+    Yields the text of each non-empty page of a PDF on disk, in page order.
+    Large documents are extracted on a process pool; small ones (or workers <= 1) stay single-process.
+    """
+    with fitz.open(path) as doc:  # Opened by path, so pages are read from disk on demand
+        page_count = doc.page_count
+        if workers <= 1 or page_count < min_parallel_pages:
+            for page in doc:
+                text = page.get_text("text")
+                if text.strip():
+                    yield text
+            return
+
+    logging.info(f"📄 Extracting {page_count} pages across {workers} processes.")
+    yield from _iter_page_texts_parallel(path, page_count, workers, shard_pages)
+
+def iter_chunks(page_texts, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Splits a stream of page texts into overlapping chunks without joining the whole document.
+    Only the last (possibly incomplete) chunk is carried into the next page, so memory stays
+    bounded by page size and boundaries depend only on the input, keeping chunk IDs deterministic.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    carry = ""
+    for text in page_texts:
+        buffer = f"{carry}\n{text}" if carry else text
+        chunks = text_splitter.split_text(buffer)
+        if not chunks:
+            continue
+        yield from chunks[:-1]
+        carry = chunks[-1]
+
+    if carry:
+        yield carry
+
+class LocalJobBackend:
+    """Runs ingestion jobs on an in-process thread pool, so no outside services are needed."""
+
+    def __init__(self, max_workers=INGEST_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, func, *args):
+        self.executor.submit(func, *args)
+
+JOB_BACKENDS = {"local": LocalJobBackend}
+_backend = None
+
+def get_job_backend():
+    """Returns the configured job backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if INGEST_BACKEND not in JOB_BACKENDS:
+            raise ValueError(f"Unknown ingestion backend: {INGEST_BACKEND}")
+        _backend = JOB_BACKENDS[INGEST_BACKEND]()
+    return _backend
+
+def enqueue_upload(file, admin_id, grade, subject):
+    """
+    Saves an uploaded PDF to disk and queues it for ingestion.
+    :param file: The uploaded file (werkzeug FileStorage)
+    :param admin_id: The ID of the admin uploading the PDF
+    :param grade: Grade level associated with the document
+    :param subject: Subject of the document
+    :return: The job ID to poll for status
+    """
+    job_id = uuid.uuid4().hex
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=UPLOAD_TMP_DIR)
+    with os.fdopen(fd, "wb") as out:
+        file.save(out)
+
+    try:
+        create_upload_job(job_id, admin_id, file.filename, grade, subject)
+        get_job_backend().submit(run_ingestion_job, job_id, path, file.filename, grade, subject)
+    except Exception:
+        os.remove(path)  # The job never started, so nothing else will clean up the upload
+        raise
+    return job_id
+
+def run_ingestion_job(job_id, path, filename, grade, subject):
+    """
+    Streams one PDF through pages -> text -> chunks -> embedding batches -> upsert batches,
+    recording progress on its job. Peak memory depends on batch size, not document size.
+    """
+    seen = {"chunks": 0}
+
+    def counted(chunks):
+        for chunk in chunks:
+            seen["chunks"] += 1
+            yield chunk
+
+    def on_batch(batch):
+        increment_upload_progress(job_id, batch["accepted"])
+        update_upload_job(job_id, chunks_total=seen["chunks"])  # Grows until the last page is read
+
+    try:
+        # Re-uploads only embed chunks whose content changed since the file's last upload
+        existing = get_chunk_manifest(filename)
+        previous_manifest = existing.get("manifest") if existing else []
+        if previous_manifest is None:
+            logging.info(f"ℹ️ {filename} has no chunk manifest; replacing all of its vectors.")
+            delete_from_pinecone(filename)
+            previous_manifest = []
+        refresh_metadata = bool(existing) and (existing.get("grade"), existing.get("subject")) != (grade, subject)
+
+        update_upload_job(job_id, stage="embedding")
+        result = store_chunk_stream(counted(iter_chunks(iter_page_texts(path))), grade, subject, filename,
+                                    on_batch=on_batch, previous_manifest=previous_manifest,
+                                    refresh_metadata=refresh_metadata)
+        if seen["chunks"] == 0:
+            raise ValueError("No extractable text found in PDF.")
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+        changes = {field: result[field] for field in ("added", "removed", "skipped")}
+        update_upload_job(job_id, stage="done", status="active", chunks_total=seen["chunks"],
+                          chunks_done=seen["chunks"], chunk_count=seen["chunks"], chunks_failed=result["failed"],
+                          changes=changes, manifest=result["manifest"])
+        retire_previous_uploads(filename, job_id)
+        logging.info(f"✅ Ingestion job {job_id} finished for {filename}: {changes}.")
+    except Exception as e:
+        logging.error(f"❌ Ingestion job {job_id} failed: {str(e)}")
+        update_upload_job(job_id, stage="failed", status="failed", error=str(e))
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def get_job_status(job_id):
+    """Returns the stage, progress and error of an ingestion job, or None if unknown."""
+    job = get_upload_job(job_id)
+    if not job:
+        return None
+    return {
+        "job_id": job["job_id"],
+        "filename": job.get("filename"),
+        "status": job.get("status"),
+        "stage": job.get("stage"),
+        "progress": {"done": job.get("chunks_done", 0), "total": job.get("chunks_total")},
+        "changes": job.get("changes"),
+        "error": job.get("error"),
+    }
@@ -0,0 +1,190 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 1500, 2000, 3000, 4000, 8000)
+
+def _escape_label_value(value):
+    """Escapes a label value as the text format requires: backslash, double quote and newline."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values = {}  # sorted label pairs -> count
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._lock = threading.Lock()
+        self._values = {}  # sorted label pairs -> [per-bucket counts, sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(key + (("le", _format_value(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format. Each Gunicorn worker keeps its own
+    registry, so scrape every worker (or run one) to see the whole picture.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = {}  # prefix -> function returning {name: number}
+
+    def counter(self, name, documentation):
+        metric = Counter(name, documentation)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_gauges(self, prefix, collect):
+        """Exposes every numeric value of collect() (e.g. a cache's stats()) as a gauge named prefix_key."""
+        self._gauges[prefix] = collect
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect in self._gauges.items():
+            try:
+                values = collect()
+            except Exception:
+                continue  # A component that is not initialized yet simply has no gauges
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+stage_seconds = registry.histogram("stage_duration_seconds", "Latency of each hot-path stage.")
+stage_errors = registry.counter("stage_errors_total", "Hot-path stages that raised.")
+batch_sizes = registry.histogram("batch_size", "Items per batched call.", SIZE_BUCKETS)
+prompt_tokens = registry.histogram("prompt_tokens", "Tokens per prompt sent to the LLM.", TOKEN_BUCKETS)
+request_seconds = registry.histogram("http_request_duration_seconds", "Latency of each HTTP request.")
+request_errors = registry.counter("http_request_errors_total", "HTTP requests answered with a 5xx status.")
+
+def _add_server_timing(stage, seconds):
+    """
+    Adds a stage's time to the current request's Server-Timing breakdown. A no-op outside a request
+    context, e.g. on the async runtime's I/O threads or the batch and upload pools.
+    """
+    if has_request_context():
+        timings = g.setdefault("server_timing", {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def track(stage, batch_size=None):
+    """
+    Times a block as a hot-path stage: records its latency (and errors, and the batch size if given)
+    and adds it to the request's Server-Timing header.
+    """
+    if batch_size is not None:
+        batch_sizes.observe(batch_size, operation=stage)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        _add_server_timing(stage, elapsed)
+
+def tracked_iterator(stage, iterator):
+    """Like track, for a streamed response: times from the first pull until the iterator is exhausted."""
+    with track(stage):
+        yield from iterator
+
+def server_timing_header(timings, total_seconds):
+    """Formats {stage: seconds} as a Server-Timing header value, in milliseconds."""
+    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+def init_app(app):
+    """
+    Records per-request latency and errors, and adds the Server-Timing header to every response.
+    The header is set in after_request, so it only covers stages timed on the request thread before
+    the view returns: stages of a streamed body run after the headers are sent, and stages on other
+    threads (the async runtime, batch pools) have no request context. Those stages are still in the
+    /metrics histograms.
+    """
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        request_seconds.observe(elapsed, endpoint=endpoint, status=response.status_code)
+        if response.status_code >= 500:
+            request_errors.inc(endpoint=endpoint)
+        response.headers["Server-Timing"] = server_timing_header(g.pop("server_timing", {}), elapsed)
+        return response
@@ -0,0 +1,129 @@
+import logging
+import threading
+from models.metrics import prompt_tokens
+from models.rerank import estimate_tokens
+
+MIN_OVERLAP_CHARS = 20  # Shorter suffix/prefix matches are treated as coincidence, not splitter overlap
+
+def chunk_position(match):
+    """A chunk's position in its file: the "chunk" field, else the "{filename}_{i}" ID suffix."""
+    if match.get("chunk") is not None:
+        return int(match["chunk"])
+    suffix = str(match.get("id", "")).rsplit("_", 1)[-1]
+    return int(suffix) if suffix.isdigit() else None
+
+def _overlap(previous, following):
+    """Length of the longest suffix of previous that following starts with."""
+    for size in range(min(len(previous), len(following)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+def compress_matches(matches):
+    """
+    Turns retrieved chunks into passages: exact duplicate texts are dropped, and chunks that were
+    neighbours in the same file are merged with the splitter's repeated overlap removed.
+    Passages keep the order of their best-ranked chunk.
+    :return: [{"text", "filename", "ids"}]
+    """
+    seen_texts = set()
+    ranked = []
+    for rank, match in enumerate(matches):
+        text = match["text"].strip()
+        if text in seen_texts:
+            continue
+        seen_texts.add(text)
+        ranked.append((rank, match, text))
+
+    passages = []
+    by_file = {}
+    for rank, match, text in ranked:
+        position = chunk_position(match)
+        if match.get("filename") is None or position is None:
+            passages.append({"rank": rank, "text": text, "filename": match.get("filename"), "ids": [match.get("id")]})
+        else:
+            by_file.setdefault(match["filename"], []).append((position, rank, match, text))
+
+    for filename, chunks in by_file.items():
+        chunks.sort(key=lambda chunk: chunk[0])
+        current, last_position = None, None
+        for position, rank, match, text in chunks:
+            if current is not None and position == last_position + 1:
+                overlap = _overlap(current["text"], text)
+                current["text"] += text[overlap:] if overlap else f" {text}"
+                current["ids"].append(match.get("id"))
+                current["rank"] = min(current["rank"], rank)
+            else:
+                current = {"rank": rank, "text": text, "filename": filename, "ids": [match.get("id")]}
+                passages.append(current)
+            last_position = position
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return [{key: passage[key] for key in ("text", "filename", "ids")} for passage in passages]
+
+def build_context(matches, token_budget):
+    """
+    Compresses retrieved chunks and keeps whole passages, best first, until the token budget is
+    spent; the best passage is truncated rather than dropped if it alone exceeds the budget.
+    :return: (context text, {"raw_tokens", "context_tokens", "chunks", "passages", "dropped_passages"})
+    """
+    passages = compress_matches(matches)
+    kept, used = [], 0
+    for passage in passages:
+        tokens = estimate_tokens(passage["text"])
+        if used + tokens > token_budget:
+            if not kept:
+                kept.append(passage["text"][:token_budget * 4])
+                used = token_budget
+            break
+        kept.append(passage["text"])
+        used += tokens
+
+    context = "\n\n".join(kept)
+    return context, {
+        "raw_tokens": sum(estimate_tokens(match["text"]) for match in matches) if matches else 0,
+        "context_tokens": estimate_tokens(context) if context else 0,
+        "chunks": len(matches),
+        "passages": len(passages),
+        "dropped_passages": len(passages) - len(kept),
+    }
+
+class PromptStats:
+    """Running totals of context tokens retrieved vs. actually sent, per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, endpoint, stats):
+        with self._lock:
+            totals = self._totals.setdefault(endpoint, {"requests": 0, "raw_tokens": 0, "context_tokens": 0, "prompt_tokens": 0})
+            totals["requests"] += 1
+            for field in ("raw_tokens", "context_tokens", "prompt_tokens"):
+                totals[field] += stats[field]
+        prompt_tokens.observe(stats["prompt_tokens"], endpoint=endpoint)
+        logging.info(
+            f"🧾 {endpoint} prompt: {stats['prompt_tokens']} tokens "
+            f"(context {stats['context_tokens']} of {stats['raw_tokens']} retrieved)"
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {**totals, "saved_tokens": totals["raw_tokens"] - totals["context_tokens"]}
+                for endpoint, totals in self._totals.items()
+            }
+
+prompt_stats = PromptStats()
+
+def build_prompt(endpoint, matches, token_budget, render):
+    """
+    Builds a prompt from retrieved matches within a token budget and records its token counts.
+    :param render: Function of the context text returning the full prompt
+    :return: (prompt, stats with "prompt_tokens" added)
+    """
+    context, stats = build_context(matches, token_budget)
+    prompt = render(context)
+    stats["prompt_tokens"] = estimate_tokens(prompt)
+    prompt_stats.record(endpoint, stats)
+    return prompt, stats
@@ -0,0 +1,221 @@
+import logging
+import queue
+import random
+import re
+import threading
+import numpy as np
+from config import (
+    QUESTION_BANK_DEDUP_SIMILARITY, QUESTION_BANK_TARGET, QUESTION_BANK_TOPUP_BATCH, QUESTION_BANK_TOPUP_ROUNDS
+)
+from models.embedding import generate_embeddings
+from models.gemini import get_llm, exam_context, format_exam_prompt
+
+QUESTION_PATTERN = re.compile(r"^\s*(?:#+\s*)?(?:\*\*)?\s*(?:Q(?:uestion)?\s*)?(\d{1,3})\s*[\.\):]\s*(?:\*\*)?\s*(.+)$", re.IGNORECASE)
+OPTION_PATTERN = re.compile(r"^\s*[-*]?\s*\(?([A-Ha-h])[\.\)]\s+(.+)$")
+ANSWER_PATTERN = re.compile(r"^\s*(?:\*\*)?\s*(?:correct\s+)?answer\s*[:\-]", re.IGNORECASE)
+
+def _clean(text):
+    return text.replace("**", "").strip()
+
+def parse_questions(text):
+    """
+    Splits a generated exam into structured items. Numbered lines ("1.", "Q2)", "**3.**") start a
+    question; lettered lines ("A)", "(b)") under it are its options. Answer keys are dropped.
+    :return: [{"question": str, "options": [str], "type": "multiple_choice" | "short_answer"}]
+    """
+    items = []
+    current = None
+    for line in (text or "").splitlines():
+        if not line.strip() or ANSWER_PATTERN.match(line):
+            continue
+        match = QUESTION_PATTERN.match(line)
+        if match:
+            current = {"question": _clean(match.group(2)), "options": []}
+            items.append(current)
+            continue
+        if current is None:
+            continue  # Preamble before the first question
+        option = OPTION_PATTERN.match(line)
+        if option:
+            current["options"].append(_clean(option.group(2)))
+        elif not current["options"]:
+            current["question"] = f"{current['question']} {_clean(line)}"  # Question text wrapped onto another line
+
+    for item in items:
+        item["type"] = "multiple_choice" if len(item["options"]) >= 2 else "short_answer"
+    return [item for item in items if item["question"]]
+
+def format_exam(items):
+    """Renders bank items as numbered exam text, the same shape generate_exam returns."""
+    lines = []
+    for number, item in enumerate(items, start=1):
+        lines.append(f"{number}. {item['question']}")
+        lines.extend(f"   {chr(ord('A') + i)}) {option}" for i, option in enumerate(item["options"]))
+    return "\n".join(lines)
+
+class QuestionBank:
+    """
+    Exam questions indexed by (grade, subject), each kept with its unit-normalized embedding so new
+    questions that are near-duplicates of stored ones (cosine >= threshold) are dropped.
+    Questions are persisted in the question_bank collection and loaded per (grade, subject) on first use.
+    Each worker caches its own copy, so top-ups and adds first reload a group whose stored count no
+    longer matches the cache (another worker added questions), and dedup sees every stored question.
+    """
+
+    def __init__(self, threshold=QUESTION_BANK_DEDUP_SIMILARITY):
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._groups = {}  # (grade, subject) -> {"items": [...], "embeddings": float32 matrix}
+
+    def _group(self, grade, subject, refresh=False):
+        """
+        Returns the cached {"items", "embeddings"} for a grade and subject, loading them on first use.
+        :param refresh: Reload first if the collection holds a different number of questions
+        """
+        from models.database import load_bank_questions, count_bank_questions
+
+        key = (grade, subject)
+        if refresh and key in self._groups and count_bank_questions(grade, subject) != len(self._groups[key]["items"]):
+            del self._groups[key]
+        if key not in self._groups:
+            items = load_bank_questions(grade, subject)
+            embeddings = np.asarray([item.pop("embedding") for item in items], dtype=np.float32)
+            self._groups[key] = {"items": items, "embeddings": embeddings if items else np.empty((0, 0), dtype=np.float32)}
+        return self._groups[key]
+
+    def count(self, grade, subject, difficulty=None, refresh=False):
+        with self._lock:
+            items = self._group(grade, subject, refresh)["items"]
+            return sum(1 for item in items if difficulty is None or item.get("difficulty") == difficulty)
+
+    def add(self, grade, subject, difficulty, items):
+        """
+        Adds parsed questions, skipping ones too similar to a stored question or to each other.
+        :return: Number of questions added
+        """
+        if not items:
+            return 0
+        embeddings = generate_embeddings([item["question"] for item in items], normalize=True)
+        with self._lock:
+            group = self._group(grade, subject, refresh=True)
+            kept, kept_embeddings = [], []
+            for item, embedding in zip(items, embeddings):
+                known = group["embeddings"]
+                if known.size and float(np.max(known @ embedding)) >= self.threshold:
+                    continue
+                if kept_embeddings and float(np.max(np.stack(kept_embeddings) @ embedding)) >= self.threshold:
+                    continue
+                kept.append({**item, "difficulty": difficulty})
+                kept_embeddings.append(embedding)
+            if not kept:
+                return 0
+
+            from models.database import store_bank_questions
+            store_bank_questions([
+                {"grade": grade, "subject": subject, **item, "embedding": embedding.tolist()}
+                for item, embedding in zip(kept, kept_embeddings)
+            ])
+            group["items"].extend(kept)
+            stacked = np.stack(kept_embeddings).astype(np.float32)
+            group["embeddings"] = np.vstack([group["embeddings"], stacked]) if group["embeddings"].size else stacked
+            return len(kept)
+
+    def sample(self, grade, subject, difficulty, count):
+        """Returns count random questions for the difficulty, or None if the bank has fewer."""
+        with self._lock:
+            items = [
+                item for item in self._group(grade, subject)["items"]
+                if difficulty is None or item.get("difficulty") == difficulty
+            ]
+        if len(items) < count:
+            return None
+        return random.sample(items, count)
+
+question_bank = QuestionBank()
+
+def _topup_prompt(grade, subject, difficulty, num_questions, context_matches):
+    prompt = format_exam_prompt(grade, subject, num_questions, context_matches)
+    if difficulty:
+        prompt += f"\n    Difficulty: {difficulty}."
+    return prompt + """
+    Number each question ("1.", "2.", ...) and put multiple-choice options on their own lines as "A)", "B)", ...
+    """
+
+def generate_into_bank(grade, subject, difficulty, num_questions=QUESTION_BANK_TOPUP_BATCH, context_matches=None):
+    """
+    Generates questions with Gemini and adds the new ones to the bank.
+    :return: (exam text, number of questions added)
+    """
+    if context_matches is None:
+        context_matches = exam_context(grade, subject)
+
+    text = get_llm().generate_content(_topup_prompt(grade, subject, difficulty, num_questions, context_matches)).text
+    return text, question_bank.add(grade, subject, difficulty, parse_questions(text))
+
+def top_up(grade, subject, difficulty, target=QUESTION_BANK_TARGET, max_rounds=QUESTION_BANK_TOPUP_ROUNDS):
+    """Generates questions until the bank holds target for the difficulty, stopping early if Gemini only repeats itself."""
+    context_matches = None
+    for _ in range(max_rounds):
+        missing = target - question_bank.count(grade, subject, difficulty, refresh=True)
+        if missing <= 0:
+            break
+        if context_matches is None:
+            context_matches = exam_context(grade, subject)
+        _, added = generate_into_bank(grade, subject, difficulty, min(missing, QUESTION_BANK_TOPUP_BATCH), context_matches)
+        if not added:
+            break
+    logging.info(f"🏦 Question bank for grade {grade} {subject} ({difficulty}): {question_bank.count(grade, subject, difficulty)} questions.")
+
+_topup_queue = queue.Queue()
+_queued = set()
+_topup_lock = threading.Lock()
+_topup_thread = None
+
+def _topup_worker():
+    while True:
+        key = _topup_queue.get()
+        try:
+            top_up(*key)
+        except Exception as e:
+            logging.error(f"❌ Question bank top-up failed for {key}: {str(e)}")
+        finally:
+            with _topup_lock:
+                _queued.discard(key)
+
+def schedule_top_up(grade, subject, difficulty):
+    """Queues a background top-up for a (grade, subject, difficulty); repeat requests are ignored while queued."""
+    global _topup_thread
+    key = (grade, subject, difficulty)
+    with _topup_lock:
+        if key in _queued:
+            return
+        _queued.add(key)
+        if _topup_thread is None:
+            _topup_thread = threading.Thread(target=_topup_worker, name="question-bank-topup", daemon=True)
+            _topup_thread.start()
+    _topup_queue.put(key)
+
+def assemble_exam(grade, subject, difficulty, num_questions=5):
+    """
+    Builds an exam from the bank, falling back to live generation when the bank is short.
+    Every request also tops the bank up in the background once it runs below target.
+    :return: {"exam": str, "source": "bank" | "live", "questions": [structured items]}
+    """
+    items = question_bank.sample(grade, subject, difficulty, num_questions)
+    if question_bank.count(grade, subject, difficulty) < QUESTION_BANK_TARGET:
+        schedule_top_up(grade, subject, difficulty)
+    if items is not None:
+        return {"exam": format_exam(items), "source": "bank", "questions": items}
+
+    text, _ = generate_into_bank(grade, subject, difficulty, num_questions)
+    return {"exam": text, "source": "live", "questions": parse_questions(text)}
+
+def import_past_exams():
+    """Seeds the bank from exams already stored in the exams collection."""
+    from models.database import load_past_exams
+
+    added = 0
+    for exam in load_past_exams():
+        added += question_bank.add(exam.get("grade"), exam.get("subject"), exam.get("difficulty"), parse_questions(exam["questions"]))
+    logging.info(f"🏦 Imported {added} questions from past exams.")
+    return added
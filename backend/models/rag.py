@@ -72,132 +72,305 @@
 #     except Exception as e:
 #         return {"error": f"Failed to delete from Pinecone: {str(e)}"}
 
+import hashlib
+import json
 import logging
-from models.embedding import generate_embedding
-from pinecone import Pinecone, ServerlessSpec
-from config import PINECONE_API_KEY, PINECONE_INDEX_NAME
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from models.embedding import generate_embeddings
+from models.metrics import track
+from models.response_cache import response_cache
+from models.retrieval import get_retrieval_service
+from models.bm25 import get_bm25_index
+from config import (
+    EMBED_BATCH_SIZE, UPSERT_BATCH_SIZE, UPSERT_MAX_BYTES, UPSERT_WORKERS, UPSERT_RETRIES, HYBRID_SEARCH,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Initialize Pinecone
-try:
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    logging.info("✅ Successfully connected to Pinecone.")
-except Exception as e:
-    logging.error(f"❌ Pinecone initialization failed: {str(e)}")
-    pc = None
+VECTOR_JSON_OVERHEAD = len('{"id": , "values": , "metadata": }, ')
 
-# Define index parameters
-index_name = PINECONE_INDEX_NAME
-dimension = 384  # Ensure this matches the embedding model's output dimensions
+def _vector_payload_size(vector):
+    """Measures the JSON request bytes a single (id, values, metadata) vector adds to an upsert."""
+    vector_id, values, metadata = vector
+    # Floats serialize to ~18-22 characters each, so the values are measured rather than estimated
+    return len(json.dumps(vector_id)) + len(json.dumps(values)) + len(json.dumps(metadata)) + VECTOR_JSON_OVERHEAD
 
-# Ensure index exists
-if pc:
-    try:
-        existing_indexes = [index["name"] for index in pc.list_indexes()]
-        if index_name not in existing_indexes:
-            pc.create_index(
-                name=index_name,
-                dimension=dimension,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")
-            )
-            logging.info(f"✅ Created new Pinecone index: {index_name}")
-        index = pc.Index(index_name)
-    except Exception as e:
-        logging.error(f"❌ Failed to create/access Pinecone index: {str(e)}")
-        index = None
-else:
-    index = None  # Prevent errors if Pinecone initialization failed
+def batch_vectors(vectors, batch_size=UPSERT_BATCH_SIZE, max_bytes=UPSERT_MAX_BYTES):
+    """Groups vectors into upsert batches capped by vector count and estimated payload bytes."""
+    batch, batch_bytes = [], 0
+    for vector in vectors:
+        size = _vector_payload_size(vector)
+        if batch and (len(batch) >= batch_size or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
 
-def store_in_pinecone(chunks, grade, subject, filename):
-    """Stores text chunks in Pinecone with metadata, handling potential failures."""
-    if not index:
-        return {"error": "Pinecone index is unavailable."}
+def _upsert_with_retry(target_index, batch_number, batch, max_retries, backoff):
+    """Upserts one batch, retrying with exponential backoff before reporting it as failed."""
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            with track("vector_upsert", batch_size=len(batch)):
+                response = target_index.upsert(vectors=batch)
+            accepted = getattr(response, "upserted_count", None)
+            if accepted is None and isinstance(response, dict):
+                accepted = response.get("upserted_count")
+            accepted = len(batch) if accepted is None else accepted
+            return {"batch": batch_number, "accepted": accepted, "failed": len(batch) - accepted, "attempts": attempts}
+        except Exception as e:
+            if attempts > max_retries:
+                logging.error(f"❌ Upsert batch {batch_number} failed after {attempts} attempts: {str(e)}")
+                return {"batch": batch_number, "accepted": 0, "failed": len(batch), "attempts": attempts, "error": str(e)}
+            logging.warning(f"⚠️ Upsert batch {batch_number} failed (attempt {attempts}), retrying: {str(e)}")
+            time.sleep(backoff * 2 ** (attempts - 1))
 
-    if not chunks or not isinstance(chunks, list):
-        return {"error": "Invalid chunks data. Must be a non-empty list."}
+def upsert_in_batches(target_index, vectors, batch_size=UPSERT_BATCH_SIZE, max_bytes=UPSERT_MAX_BYTES,
+                      max_workers=UPSERT_WORKERS, max_retries=UPSERT_RETRIES, backoff=0.5, on_batch=None,
+                      on_stored=None):
+    """
+    Upserts vectors in size-capped batches through a bounded thread pool.
+    :param target_index: Any object exposing upsert(vectors=[...]) (a VectorStore, Pinecone index or a fake)
+    :param vectors: Iterable of (id, values, metadata) tuples; consumed lazily
+    :param batch_size: Maximum vectors per upsert request
+    :param max_bytes: Maximum estimated payload bytes per upsert request
+    :param max_workers: Number of concurrent upsert requests
+    :param max_retries: Retries per batch before it is counted as failed
+    :param on_batch: Optional callback invoked with each batch result as it completes
+    :param on_stored: Optional callback invoked with the vectors of each batch that was fully accepted
+    :return: {"accepted": int, "failed": int, "batches": [per-batch result, in order]}
+    """
+    results = []
+
+    submitted = {}  # future -> its batch, kept only while the batch is in flight
+
+    def collect(futures):
+        for future in futures:
+            result = future.result()
+            batch = submitted.pop(future)
+            results.append(result)
+            if on_stored and not result["failed"]:
+                on_stored(batch)
+            if on_batch:
+                on_batch(result)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for batch_number, batch in enumerate(batch_vectors(vectors, batch_size, max_bytes)):
+            # Bound in-flight batches so vectors are not all held in memory at once
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = pool.submit(_upsert_with_retry, target_index, batch_number, batch, max_retries, backoff)
+            submitted[future] = batch
+            pending.add(future)
+        collect(pending)
+
+    results.sort(key=lambda result: result["batch"])
+    return {
+        "accepted": sum(result["accepted"] for result in results),
+        "failed": sum(result["failed"] for result in results),
+        "batches": results,
+    }
+
+def chunk_id(filename, text, occurrence=0):
+    """
+    Content-addressed chunk ID: a hash of the file name and the whitespace-normalized text, so the
+    same chunk keeps its ID across re-uploads. occurrence tells repeated identical chunks apart.
+    """
+    normalized = " ".join(text.split())
+    digest = hashlib.sha256(f"{filename}\0{normalized}\0{occurrence}".encode("utf-8")).hexdigest()[:24]
+    return f"{filename}:{digest}"
+
+def _iter_vectors(chunks, grade, subject, filename, batch_size, plan, vector_store):
+    """
+    Embeds new or changed chunks one batch at a time and yields Pinecone vectors for them.
+    Chunks listed in plan["previous"] are looked up in the vector store: ones that are really stored
+    are skipped, and re-sent with their stored values if their position or grade/subject changed;
+    ones that are missing are embedded again. plan["manifest"] collects every chunk ID in order.
+    """
+    previous = plan["previous"]
+    occurrences = {}
+    chunks = iter(chunks)
+    i = 0
+    while True:
+        batch = list(islice(chunks, batch_size))
+        if not batch:
+            break
+
+        pending, known = [], []
+        for chunk in batch:
+            key = " ".join(chunk.split())
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            vector_id = chunk_id(filename, chunk, occurrence)
+            metadata = {"text": chunk, "grade": grade, "subject": subject, "filename": filename, "chunk": i}
+            plan["manifest"].append(vector_id)
+            if vector_id in previous:
+                known.append((vector_id, chunk, metadata))
+            else:
+                pending.append((vector_id, chunk, metadata))
+            i += 1
+
+        if known:
+            # The manifest can be stale (e.g. vectors deleted since), so only skip chunks that are really stored
+            with track("vector_fetch", batch_size=len(known)):
+                stored = vector_store.fetch_values([vector_id for vector_id, _, _ in known])
+            for vector_id, chunk, metadata in known:
+                if vector_id not in stored:
+                    logging.warning(f"⚠️ Chunk {vector_id} is in the manifest but not in the vector store; re-embedding it.")
+                    pending.append((vector_id, chunk, metadata))
+                    continue
+                plan["skipped"] += 1
+                if previous[vector_id] != metadata["chunk"] or plan["refresh_metadata"]:
+                    plan["moved"] += 1
+                    yield (vector_id, stored[vector_id], metadata)  # Same values, new metadata
+
+        plan["added"] += len(pending)
+        if not pending:
+            continue
+
+        embeddings = generate_embeddings([chunk for _, chunk, _ in pending], batch_size=batch_size)
+        for (vector_id, chunk, metadata), embedding in zip(pending, embeddings):
+            if not embedding.any():
+                logging.warning(f"⚠️ Skipping chunk {metadata['chunk']} - failed embedding.")
+                plan["failed_ids"].add(vector_id)
+            else:
+                yield (vector_id, embedding.tolist(), metadata)
+
+def store_chunk_stream(chunks, grade, subject, filename, batch_size=EMBED_BATCH_SIZE, on_batch=None,
+                       previous_manifest=None, refresh_metadata=False):
+    """
+    Embeds and upserts chunks from any iterable (e.g. a generator), holding only a few batches at a time.
+    Chunk IDs are content hashes (see chunk_id), so re-uploading a file only embeds new or changed chunks.
+    :param previous_manifest: Chunk IDs, in order, already stored for this file (e.g. from pdf_uploads).
+                              Unchanged chunks are skipped and chunks no longer present are deleted
+                              (kept instead if any chunk failed to store, or if there are no chunks at all).
+    :param refresh_metadata: Rewrite metadata on skipped chunks too (grade or subject changed)
+    :return: Upload summary with "added", "removed", "skipped" and "moved" counts and the new "manifest"
+             (None if some chunks failed, so the next upload re-checks everything)
+    """
+    vector_store = get_retrieval_service().vector_store
+    if vector_store is None:
+        return {"error": "Vector store is unavailable."}
+
+    previous_manifest = previous_manifest or []
+    plan = {
+        "previous": {vector_id: position for position, vector_id in enumerate(previous_manifest)},
+        "refresh_metadata": refresh_metadata,
+        "manifest": [], "added": 0, "moved": 0, "skipped": 0, "failed_ids": set(),
+    }
+
+    bm25_index = get_bm25_index() if HYBRID_SEARCH else None
+
+    def index_lexically(batch):
+        # Only chunks the vector store accepted go into the lexical index, so the two stay in step
+        for vector_id, _, metadata in batch:
+            bm25_index.add(vector_id, metadata["text"], metadata)
 
     try:
-        vectors = []
-        for i, chunk in enumerate(chunks):
-            embedding = generate_embedding(chunk)
-            if not embedding:
-                logging.warning(f"⚠️ Skipping chunk {i} - failed embedding.")
-                continue  # Skip if embedding fails
-
-            vectors.append((
-                f"{filename}_{i}",  # Unique identifier
-                embedding,
-                {"text": chunk, "grade": grade, "subject": subject, "filename": filename}
-            ))
-
-        if vectors:
-            index.upsert(vectors)
-            return {"message": f"✅ Stored {len(vectors)} chunks for {filename} in Pinecone."}
-        else:
-            return {"error": "Failed to generate embeddings for all chunks."}
+        vectors = _iter_vectors(chunks, grade, subject, filename, batch_size, plan, vector_store)
+        result = upsert_in_batches(vector_store, vectors, on_batch=on_batch,
+                                   on_stored=index_lexically if bm25_index is not None else None)
+        failed = result["failed"] + len(plan["failed_ids"])
+
+        if not plan["manifest"]:
+            # Nothing to replace the file's chunks with (e.g. an image-only PDF): leave the old ones alone
+            return {"error": "No chunks to store; the file's existing vectors were kept."}
+
+        current = set(plan["manifest"])
+        removed_ids = [vector_id for vector_id in previous_manifest if vector_id not in current]
+        if removed_ids and failed:
+            # Keep the old chunks while new ones are missing; the next upload (no manifest) replaces them all
+            logging.warning(f"⚠️ Keeping {len(removed_ids)} old chunks of {filename}: {failed} chunks failed to store.")
+            removed_ids = []
+        if removed_ids:
+            vector_store.delete(ids=removed_ids)
+            if bm25_index is not None:
+                bm25_index.remove(removed_ids)
+
+        vector_store.flush()
+        if bm25_index is not None:
+            bm25_index.flush()
+
+        if plan["added"] or removed_ids:
+            response_cache.invalidate_file(filename)  # Cached answers built on the old text are stale
+
+        summary = {
+            "added": plan["added"],
+            "removed": len(removed_ids),
+            "skipped": plan["skipped"],
+            "moved": plan["moved"],
+            "accepted": result["accepted"],
+            "failed": failed,
+            "batches": result["batches"],
+            "manifest": plan["manifest"] if not failed else None,
+        }
+        if plan["added"] and not result["accepted"]:
+            return {"error": "Failed to store any chunks in Pinecone.", **summary}
+        summary["message"] = (
+            f"✅ Stored {filename} in Pinecone: {summary['added']} added, "
+            f"{summary['removed']} removed, {summary['skipped']} unchanged."
+        )
+        return summary
     except Exception as e:
         logging.error(f"❌ Error storing data in Pinecone: {str(e)}")
         return {"error": f"Pinecone storage failed: {str(e)}"}
 
-def search_pinecone(query, grade=None, subject=None, top_k=3):
-    """Searches Pinecone for relevant content, handling errors and falling back to AI."""
-    from models.gemini import generate_response  # ✅ Import here to prevent circular import
+def store_in_pinecone(chunks, grade, subject, filename, batch_size=EMBED_BATCH_SIZE, on_batch=None, previous_manifest=None,
+                      refresh_metadata=False):
+    """Stores text chunks in Pinecone with metadata, handling potential failures."""
+    if not chunks or not isinstance(chunks, list):
+        return {"error": "Invalid chunks data. Must be a non-empty list."}
 
-    if not index:
-        return {"error": "Pinecone index is unavailable."}
+    return store_chunk_stream(chunks, grade, subject, filename, batch_size=batch_size, on_batch=on_batch,
+                              previous_manifest=previous_manifest, refresh_metadata=refresh_metadata)
 
-    if not query or not isinstance(query, str):
-        return {"error": "Invalid query. Must be a non-empty string."}
+def search_pinecone_matches(query, grade=None, subject=None, top_k=3, query_embedding=None):
+    """Searches Pinecone and returns matches as dicts with id, score, text and filename."""
+    with track("retrieve"):
+        return get_retrieval_service().search(query, grade, subject, top_k, query_embedding=query_embedding)
 
-    try:
-        query_embedding = generate_embedding(query)
-        if not query_embedding:
-            return {"error": "Failed to generate embedding for query."}
-
-        # Build metadata filter
-        metadata_filter = {}
-        if grade:
-            metadata_filter["grade"] = grade
-        if subject:
-            metadata_filter["subject"] = subject
-
-        results = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True,
-            filter=metadata_filter if metadata_filter else None
-        )
+def search_pinecone(query, grade=None, subject=None, top_k=3):
+    """Searches Pinecone for relevant content, handling errors and falling back to AI."""
+    from models.gemini import generate_response  # ✅ Import here to prevent circular import
 
-        retrieved_texts = [
-            match["metadata"]["text"]
-            for match in results.get("matches", [])
-            if "metadata" in match and "text" in match["metadata"]
-        ]
+    matches = search_pinecone_matches(query, grade, subject, top_k)
+    if isinstance(matches, dict):
+        return matches  # Error details
 
-        if retrieved_texts:
-            return retrieved_texts  # ✅ Return relevant content
-        else:
-            logging.info("ℹ️ No relevant results found in Pinecone. Falling back to AI response.")
-            return [generate_response(query)]  # 🔄 AI fallback if nothing is retrieved
+    retrieved_texts = [match["text"] for match in matches]
 
-    except Exception as e:
-        logging.error(f"❌ Pinecone query failed: {str(e)}")
-        return {"error": f"Pinecone search failed: {str(e)}"}
+    if retrieved_texts:
+        return retrieved_texts  # ✅ Return relevant content
+    else:
+        logging.info("ℹ️ No relevant results found in Pinecone. Falling back to AI response.")
+        return [generate_response(query)]  # 🔄 AI fallback if nothing is retrieved
 
 def delete_from_pinecone(filename):
     """Deletes all vector data related to a specific file, handling potential failures."""
-    if not index:
-        return {"error": "Pinecone index is unavailable."}
+    vector_store = get_retrieval_service().vector_store
+    if vector_store is None:
+        return {"error": "Vector store is unavailable."}
 
     if not filename or not isinstance(filename, str):
         return {"error": "Invalid filename. Must be a non-empty string."}
 
     try:
         query_filter = {"filename": filename}
-        index.delete(filter=query_filter)
+        vector_store.delete(filter=query_filter)
+        vector_store.flush()
+        if HYBRID_SEARCH:
+            bm25_index = get_bm25_index()
+            bm25_index.remove_file(filename)
+            bm25_index.flush()
+        response_cache.invalidate_file(filename)  # Cached answers built on this file are now stale
         return {"message": f"✅ Successfully deleted all content related to {filename} from Pinecone."}
     except Exception as e:
         logging.error(f"❌ Failed to delete from Pinecone: {str(e)}")
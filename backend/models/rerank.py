@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+from config import (
+    RERANK_MODEL_NAME, RERANK_TOP_N, RERANK_TOKEN_BUDGET, RERANK_TIME_BUDGET_MS, RERANK_BATCH_SIZE,
+)
+from models.metrics import track
+
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+
+def get_cross_encoder():
+    """Loads the cross-encoder on first use."""
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+                _cross_encoder = CrossEncoder(RERANK_MODEL_NAME)
+    return _cross_encoder
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+def fit_token_budget(matches, top_n, token_budget):
+    """Keeps matches in order until top_n are selected or the next one would exceed the token budget."""
+    selected, used = [], 0
+    for match in matches:
+        tokens = estimate_tokens(match["text"])
+        if selected and used + tokens > token_budget:
+            break
+        selected.append(match)
+        used += tokens
+        if len(selected) >= top_n:
+            break
+    return selected
+
+def rerank(query, matches, top_n=RERANK_TOP_N, token_budget=RERANK_TOKEN_BUDGET,
+           time_budget_ms=RERANK_TIME_BUDGET_MS, batch_size=RERANK_BATCH_SIZE):
+    """
+    Re-scores over-fetched matches with a cross-encoder, in batches, and keeps the best top_n
+    that fit the token budget. The time budget starts once the model is loaded; if it runs out
+    before every match is scored, no further batch is started and the vector order is kept.
+    :return: (selected matches, {"status": "applied" | "over_budget" | "failed", "rerank_ms": float})
+    """
+    started = time.perf_counter()
+    scores = []
+    status = "applied"
+
+    try:
+        model = get_cross_encoder()
+        deadline = time.perf_counter() + time_budget_ms / 1000.0  # A cold model load doesn't eat the budget
+        for start in range(0, len(matches), batch_size):
+            if time.perf_counter() > deadline:
+                status = "over_budget"
+                break
+            batch = matches[start:start + batch_size]
+            with track("rerank", batch_size=len(batch)):
+                scores.extend(float(score) for score in model.predict([(query, match["text"]) for match in batch]))
+    except Exception as e:
+        logging.error(f"❌ Rerank failed, keeping vector order: {str(e)}")
+        status = "failed"
+
+    if status == "applied":
+        ordered = [
+            {**match, "rerank_score": score}
+            for match, score in sorted(zip(matches, scores), key=lambda pair: pair[1], reverse=True)
+        ]
+    else:
+        ordered = matches
+
+    rerank_ms = (time.perf_counter() - started) * 1000
+    return fit_token_budget(ordered, top_n, token_budget), {"status": status, "rerank_ms": rerank_ms}
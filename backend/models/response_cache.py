@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_SIMILARITY
+from models.embedding import normalize_query
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of generated answers.
+    Exact hits are keyed on (grade, subject, retrieved chunk IDs, normalized query). When a similarity
+    threshold is set, a query whose embedding is close enough to a cached one with the same
+    grade/subject filters also counts as a hit. Entries remember the files their chunks came from
+    so deleting a file drops every answer built on it.
+    """
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, similarity_threshold=RESPONSE_CACHE_SIMILARITY):
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # key -> {"answer", "embedding", "filters", "filenames"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, grade, subject, chunk_ids):
+        return (grade, subject, tuple(sorted(chunk_ids)), normalize_query(query))
+
+    def get(self, key):
+        """Returns the cached answer for an exact key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["answer"]
+
+    def get_similar(self, embedding, grade, subject):
+        """Returns the answer of the most similar cached query with the same filters, if above the threshold."""
+        if not self.similarity_threshold:
+            return None
+
+        query_vector = _unit(embedding)
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["filters"] == (grade, subject) and entry["embedding"] is not None
+            ]
+            if candidates:
+                scores = np.stack([entry["embedding"] for _, entry in candidates]) @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return entry["answer"]
+            return None  # Misses are counted by the exact lookup that follows
+
+    def put(self, key, answer, embedding=None, filenames=()):
+        grade, subject = key[0], key[1]
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": _unit(embedding) if embedding is not None else None,
+                "filters": (grade, subject),
+                "filenames": set(filenames),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_file(self, filename):
+        """Drops every cached answer that used chunks from the given file."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if filename in entry["filenames"]]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns hit/miss counters and the current hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+response_cache = ResponseCache()
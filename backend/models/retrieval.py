@@ -0,0 +1,139 @@
+import logging
+import threading
+from collections import defaultdict
+from config import PINECONE_INDEX_NAME, VECTOR_BACKEND, HYBRID_SEARCH, HYBRID_CANDIDATES, RRF_K
+from models.bm25 import get_bm25_index
+from models.embedding import embed_query
+from models.metrics import track
+from models.vector_store import get_vector_store
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuses several ranked ID lists: each ID scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class RetrievalService:
+    """
+    Single retrieval entry point shared by every blueprint in a worker.
+    Owns the vector store handle and hands out the worker's one Mongo connection pool; both are
+    created on first use rather than at import time.
+    """
+
+    def __init__(self, index_name=PINECONE_INDEX_NAME, backend=VECTOR_BACKEND, hybrid=HYBRID_SEARCH):
+        self.index_name = index_name
+        self.backend = backend
+        self.hybrid = hybrid
+        self._vector_store = None
+        self._lock = threading.Lock()
+
+    @property
+    def vector_store(self):
+        """The vector store (Pinecone index or local store), or None if it cannot be initialized."""
+        if self._vector_store is None:
+            with self._lock:
+                if self._vector_store is None:
+                    self._vector_store = get_vector_store(self.index_name, self.backend)
+        return self._vector_store
+
+    @property
+    def db(self):
+        """The shared education_ai Mongo database (one connection pool per worker)."""
+        from models.database import db
+        return db
+
+    @staticmethod
+    def build_filter(grade=None, subject=None):
+        metadata_filter = {}
+        if grade:
+            metadata_filter["grade"] = grade
+        if subject:
+            metadata_filter["subject"] = subject
+        return metadata_filter
+
+    def search(self, query, grade=None, subject=None, top_k=3, query_embedding=None):
+        """
+        Searches the vector store with optional grade/subject filters. In hybrid mode the vector
+        ranking is fused with a BM25 ranking using reciprocal rank fusion, and "score" is the fused score.
+        :return: [{"id", "score", "text", "filename", "chunk"}] best first, or {"error": ...}
+        """
+        if not query or not isinstance(query, str):
+            return {"error": "Invalid query. Must be a non-empty string."}
+
+        store = self.vector_store
+        if store is None:
+            return {"error": "Vector store is unavailable."}
+
+        try:
+            if query_embedding is None:
+                query_embedding = embed_query(query)
+            if not query_embedding:
+                return {"error": "Failed to generate embedding for query."}
+
+            metadata_filter = self.build_filter(grade, subject)
+            if self.hybrid:
+                return self._hybrid_search(store, query, query_embedding, metadata_filter, top_k)
+
+            with track("vector_query"):
+                results = store.query(query_embedding, top_k=top_k, filter=metadata_filter)
+
+            return [
+                {
+                    "id": match["id"],
+                    "score": match["score"],
+                    "text": match["metadata"]["text"],
+                    "filename": match["metadata"].get("filename"),
+                    "chunk": match["metadata"].get("chunk"),
+                }
+                for match in results
+                if "text" in match["metadata"]
+            ]
+
+        except Exception as e:
+            logging.error(f"❌ Vector search failed: {str(e)}")
+            return {"error": f"Vector search failed: {str(e)}"}
+
+    def _hybrid_search(self, store, query, query_embedding, metadata_filter, top_k):
+        depth = max(top_k, HYBRID_CANDIDATES)
+        with track("vector_query"):
+            vector_matches = store.query(query_embedding, top_k=depth, filter=metadata_filter)
+        with track("bm25_query"):
+            lexical_matches = get_bm25_index().search(query, top_k=depth, filter=metadata_filter)
+
+        documents = {
+            match["id"]: {
+                "text": match["metadata"]["text"],
+                "filename": match["metadata"].get("filename"),
+                "chunk": match["metadata"].get("chunk"),
+            }
+            for match in vector_matches if "text" in match["metadata"]
+        }
+        bm25_index = get_bm25_index()
+        for chunk_id, _ in lexical_matches:
+            if chunk_id not in documents:
+                doc = bm25_index.get(chunk_id)
+                if doc:
+                    documents[chunk_id] = {"text": doc["text"], "filename": doc["filename"], "chunk": doc.get("chunk")}
+
+        fused = reciprocal_rank_fusion([
+            [match["id"] for match in vector_matches],
+            [chunk_id for chunk_id, _ in lexical_matches],
+        ])
+        return [
+            {"id": doc_id, "score": score, **documents[doc_id]}
+            for doc_id, score in fused if doc_id in documents
+        ][:top_k]
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_retrieval_service():
+    """Returns the worker-wide retrieval service."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RetrievalService()
+    return _service
@@ -0,0 +1,74 @@
+import threading
+from models.embedding import normalize_query
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical work: the first caller for a key runs the function and
+    every caller that arrives while it is in flight waits for, and shares, the same result (or
+    exception). Nothing is kept once the call finishes, so results are never stale.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(query, *filters):
+        """Key on the normalized query plus its filters (grade, subject, top_k, ...)."""
+        return (normalize_query(query),) + tuple(filters)
+
+    def do(self, key, fn):
+        """
+        Runs fn() once per in-flight key.
+        :return: (result, shared), where shared is True if this caller reused another caller's result
+                 (always False for the caller that ran fn)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self):
+        """Returns how many calls ran and how many requests were served by another request's call."""
+        with self._lock:
+            requests = self.executions + self.coalesced
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalesced_rate": self.coalesced / requests if requests else 0.0,
+            }
+
+query_flight = SingleFlight("query")
+answer_flight = SingleFlight("answer")
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import RERANK_ENABLED
+
+startup_timings = OrderedDict()  # component -> seconds
+
+@contextmanager
+def timed(component):
+    """Records how long a startup step takes under the given component name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[component] = time.perf_counter() - started
+
+def print_startup_report(title="Startup time breakdown"):
+    """Prints the recorded per-component timings, slowest first."""
+    total = sum(startup_timings.values())
+    print(f"⏱️ {title} ({total:.2f}s total):")
+    for component, seconds in sorted(startup_timings.items(), key=lambda item: -item[1]):
+        print(f"   {component:<28} {seconds:7.3f}s")
+
+def _warm_embedding_model():
+    from models.embedding import get_embed_model
+    get_embed_model().encode("warm up")  # First encode also initializes the tokenizer
+
+def _warm_llm():
+    from models.gemini import get_llm
+    get_llm()
+
+def _warm_vector_store():
+    from models.retrieval import get_retrieval_service
+    get_retrieval_service().vector_store
+
+def _warm_mongo():
+    from models.database import client
+    client.admin.command("ping")
+
+def _ensure_mongo_indexes():
+    from models.db_indexes import ensure_indexes, explain_hot_queries
+    ensure_indexes()
+    explain_hot_queries()  # Logs a warning for any hot query that is still a COLLSCAN
+
+def _warm_cross_encoder():
+    from models.rerank import get_cross_encoder
+    get_cross_encoder().predict([("warm up", "warm up")])
+
+WARMUP_STEPS = [
+    ("embedding model", _warm_embedding_model),
+    ("gemini client", _warm_llm),
+    ("vector store", _warm_vector_store),
+    ("mongo connection", _warm_mongo),
+]
+if RERANK_ENABLED:
+    WARMUP_STEPS.insert(1, ("cross-encoder", _warm_cross_encoder))
+
+def warm_up():
+    """Initializes every lazily created resource now, timing each one. Failures are logged, not raised."""
+    for component, step in WARMUP_STEPS:
+        try:
+            with timed(f"warm-up: {component}"):
+                step()
+        except Exception as e:
+            logging.error(f"❌ Warm-up of {component} failed: {str(e)}")
+    print_startup_report("Warm-up complete")
+
+def start_background_warmup(delay=1.0):
+    """
+    Runs warm_up() on a daemon thread after a short delay, so the server is already
+    accepting connections while models and clients load.
+    """
+    def run():
+        time.sleep(delay)
+        warm_up()
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def start_background_index_check(delay=1.0):
+    """
+    Creates and verifies the Mongo indexes (see models/db_indexes.py) on a daemon thread. Runs
+    whether or not warm-up is enabled, so WARMUP_ON_START=false never skips it.
+    """
+    def run():
+        time.sleep(delay)
+        try:
+            with timed("mongo indexes"):
+                _ensure_mongo_indexes()
+        except Exception as e:
+            logging.error(f"❌ Mongo index check failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name="mongo-indexes", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,389 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from config import PINECONE_API_KEY, PINECONE_INDEX_NAME, VECTOR_BACKEND, LOCAL_VECTOR_DIR, LOCAL_INDEX_MODE
+from models.ann_index import IVFIndex
+
+EMBEDDING_DIMENSION = 384  # Ensure this matches the embedding model's output dimensions
+FILTER_FIELDS = ("grade", "subject", "filename")  # Metadata fields the local store can pre-filter on
+
+class VectorStore(ABC):
+    """
+    Interface shared by every vector backend. Vectors are (id, values, metadata) tuples and
+    filters are Pinecone-style metadata dicts, e.g. {"grade": "5", "subject": {"$eq": "math"}}.
+    """
+
+    @abstractmethod
+    def upsert(self, vectors):
+        """Inserts or replaces vectors. Returns {"upserted_count": int}."""
+
+    @abstractmethod
+    def query(self, vector, top_k=3, filter=None):
+        """Returns up to top_k matches as [{"id", "score", "metadata"}], best first."""
+
+    @abstractmethod
+    def delete(self, ids=None, filter=None):
+        """Deletes vectors by ID or by metadata filter."""
+
+    @abstractmethod
+    def fetch_values(self, ids):
+        """Returns {id: values} for the given IDs; IDs that are not stored are left out."""
+
+    def flush(self):
+        """Persists pending writes, for backends that buffer them."""
+
+class PineconeVectorStore(VectorStore):
+    """Vector store backed by a Pinecone serverless index."""
+
+    def __init__(self, index_name=PINECONE_INDEX_NAME, dimension=EMBEDDING_DIMENSION):
+        from pinecone import Pinecone, ServerlessSpec
+
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        logging.info("✅ Successfully connected to Pinecone.")
+
+        # Ensure index exists
+        existing_indexes = [index["name"] for index in pc.list_indexes()]
+        if index_name not in existing_indexes:
+            pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+            logging.info(f"✅ Created new Pinecone index: {index_name}")
+        self.index = pc.Index(index_name)
+
+    def upsert(self, vectors):
+        response = self.index.upsert(vectors=vectors)
+        return {"upserted_count": getattr(response, "upserted_count", len(vectors))}
+
+    def query(self, vector, top_k=3, filter=None):
+        results = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            filter=filter if filter else None
+        )
+        return [
+            {"id": match["id"], "score": match.get("score"), "metadata": match.get("metadata") or {}}
+            for match in results.get("matches", [])
+        ]
+
+    def delete(self, ids=None, filter=None):
+        if ids:
+            self.index.delete(ids=list(ids))
+        elif filter:
+            self.index.delete(filter=filter)
+
+    def fetch_values(self, ids):
+        response = self.index.fetch(ids=list(ids))
+        vectors = response.get("vectors", {}) if isinstance(response, dict) else response.vectors
+        return {
+            vector_id: list(vector["values"] if isinstance(vector, dict) else vector.values)
+            for vector_id, vector in vectors.items()
+        }
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store: a float32 matrix of unit-normalized rows searched by brute-force cosine.
+    Grade, subject and filename are kept as integer-coded numpy columns, updated on every write,
+    so filters are applied with vectorized comparisons before scoring.
+    flush() writes the matrix to a .npy file plus a JSON sidecar of IDs and metadata; the file is
+    opened memory-mapped when the store is next loaded. With index_mode="ivf", queries only score
+    rows in the closest IVF lists.
+    Each worker process holds its own copy: other workers pick up the saved files on their next
+    read, and writes since the last flush are replayed on top of the files if another worker saved
+    them in the meantime, so concurrent uploads don't drop vectors (the same scheme as BM25Index).
+    """
+
+    def __init__(self, directory=LOCAL_VECTOR_DIR, dimension=EMBEDDING_DIMENSION, index_mode=LOCAL_INDEX_MODE):
+        self.directory = directory
+        self.dimension = dimension
+        self.ann = IVFIndex() if index_mode == "ivf" else None
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_mtime = None
+        self._pending = []  # Writes since the last load/flush, replayed if another worker saved first
+        self._load()
+
+    def _reset(self):
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._count = 0
+        self._ids = []
+        self._metadata = []
+        self._codes = {field: np.empty(0, dtype=np.int32) for field in FILTER_FIELDS}  # Row -> value code
+        self._vocab = {field: {} for field in FILTER_FIELDS}  # Value -> code
+        self._row_of = {}
+        if self.ann:
+            self.ann = IVFIndex(nlist=self.ann.nlist, nprobe=self.ann.nprobe, min_train=self.ann.min_train)
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.npy")
+
+    @property
+    def _metadata_path(self):
+        return os.path.join(self.directory, "metadata.json")
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def _lock_path(self):
+        return os.path.join(self.directory, "store.lock")
+
+    def _load(self, locked=False):
+        """
+        Replaces the in-memory store with the saved files.
+        :param locked: The caller already holds the exclusive file lock (see flush)
+        """
+        if not os.path.exists(self._vectors_path) or not os.path.exists(self._metadata_path):
+            return
+        if not locked:
+            # Shared lock, so a flush in another worker never hands us new vectors with old metadata
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_SH)
+                return self._load(locked=True)
+
+        with open(self._metadata_path) as f:
+            saved = json.load(f)
+        self._reset()
+        self._vectors = np.load(self._vectors_path, mmap_mode="r")  # Copied into memory on first write
+        self._count = len(saved["ids"])
+        self._ids = saved["ids"]
+        self._metadata = saved["metadata"]
+        self._codes = {
+            field: np.fromiter((self._code(field, meta.get(field)) for meta in self._metadata), dtype=np.int32, count=self._count)
+            for field in FILTER_FIELDS
+        }
+        self._row_of = {vector_id: row for row, vector_id in enumerate(self._ids)}
+        if self.ann:
+            self.ann.load(self.directory, self._count)
+        self._loaded_mtime = os.path.getmtime(self._metadata_path)
+        logging.info(f"✅ Loaded {self._count} vectors from {self.directory}.")
+
+    def _reload_if_changed(self):
+        """Picks up store files written by another worker."""
+        if self._pending or not os.path.exists(self._metadata_path):
+            return
+        if os.path.getmtime(self._metadata_path) != self._loaded_mtime:
+            self._load()
+
+    def _code(self, field, value):
+        vocab = self._vocab[field]
+        if value not in vocab:
+            vocab[value] = len(vocab)
+        return vocab[value]
+
+    def _set_codes(self, row, metadata):
+        for field in FILTER_FIELDS:
+            self._codes[field][row] = self._code(field, metadata.get(field))
+
+    def _ensure_capacity(self, needed):
+        for field, codes in self._codes.items():
+            if codes.shape[0] < needed:
+                grown_codes = np.empty(max(needed, codes.shape[0] * 2, 1024), dtype=np.int32)
+                grown_codes[:self._count] = codes[:self._count]
+                self._codes[field] = grown_codes
+        capacity = self._vectors.shape[0]
+        if needed <= capacity and isinstance(self._vectors, np.ndarray) and self._vectors.flags.writeable:
+            return
+        grown = np.empty((max(needed, capacity * 2, 1024), self.dimension), dtype=np.float32)
+        grown[:self._count] = self._vectors[:self._count]
+        self._vectors = grown
+
+    def upsert(self, vectors):
+        with self._lock:
+            self._reload_if_changed()
+            vectors = list(vectors)
+            self._pending.append(("upsert", [vector_id for vector_id, _, _ in vectors]))
+            return self._upsert(vectors)
+
+    def _upsert(self, vectors):
+        with self._lock:
+            self._ensure_capacity(self._count + len(vectors))
+            rows = []
+            for vector_id, values, metadata in vectors:
+                values = np.asarray(values, dtype=np.float32)
+                norm = np.linalg.norm(values)
+                row = self._row_of.get(vector_id)
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                    self._row_of[vector_id] = row
+                    self._ids.append(vector_id)
+                    self._metadata.append(metadata)
+                else:
+                    self._metadata[row] = metadata
+                self._set_codes(row, metadata)
+                self._vectors[row] = values / norm if norm else values
+                rows.append(row)
+            if self.ann:
+                self.ann.update(self._vectors[:self._count], rows)
+            return {"upserted_count": len(vectors)}
+
+    def _filter_mask(self, filter):
+        """
+        Boolean mask of rows matching a Pinecone-style equality / $eq / $in filter.
+        FILTER_FIELDS compare integer codes; other fields fall back to a scan of the metadata.
+        """
+        mask = np.ones(self._count, dtype=bool)
+        for field, condition in (filter or {}).items():
+            values = list(condition["$in"]) if isinstance(condition, dict) and "$in" in condition else [
+                condition["$eq"] if isinstance(condition, dict) else condition
+            ]
+            if field in self._codes:
+                vocab = self._vocab[field]
+                wanted = [vocab[value] for value in values if value in vocab]
+                codes = self._codes[field][:self._count]
+                mask &= codes == wanted[0] if len(wanted) == 1 else np.isin(codes, wanted)
+            else:
+                column = np.asarray([meta.get(field) for meta in self._metadata], dtype=object)
+                mask &= np.isin(column, values)
+        return mask
+
+    def query(self, vector, top_k=3, filter=None, exact=False, nprobe=None):
+        query_vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector = query_vector / norm
+
+        with self._lock:
+            self._reload_if_changed()
+            if not self._count:
+                return []
+            mask = self._filter_mask(filter) if filter else None
+            rows = None
+            if self.ann and self.ann.trained and not exact:
+                candidates = self.ann.candidates(query_vector, nprobe)
+                if mask is not None:
+                    candidates = candidates[mask[candidates]]
+                if candidates.size >= top_k:
+                    rows = candidates  # Otherwise the probed lists are too sparse; fall back to exact
+            if rows is None and mask is None:
+                # Unfiltered exact search: score in place, no gather copy; rows are in matrix order
+                rows = np.arange(self._count)
+                scores = self._vectors[:self._count] @ query_vector
+            else:
+                if rows is None:
+                    rows = np.flatnonzero(mask)
+                if not rows.size:
+                    return []
+                scores = self._vectors[rows] @ query_vector
+            k = min(top_k, rows.size)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {"id": self._ids[rows[i]], "score": float(scores[i]), "metadata": self._metadata[rows[i]]}
+                for i in best
+            ]
+
+    def delete(self, ids=None, filter=None):
+        with self._lock:
+            self._reload_if_changed()
+            if ids:
+                ids = list(ids)
+                self._pending.append(("delete", ids))
+            elif filter:
+                self._pending.append(("delete_filter", filter))
+            self._delete(ids, filter)
+
+    def _delete(self, ids=None, filter=None):
+        with self._lock:
+            if ids:
+                doomed = {self._row_of[vector_id] for vector_id in ids if vector_id in self._row_of}
+            elif filter:
+                doomed = set(np.flatnonzero(self._filter_mask(filter)).tolist())
+            else:
+                return
+            if not doomed:
+                return
+
+            keep = [row for row in range(self._count) if row not in doomed]
+            self._vectors = np.ascontiguousarray(self._vectors[keep], dtype=np.float32)
+            self._ids = [self._ids[row] for row in keep]
+            self._metadata = [self._metadata[row] for row in keep]
+            self._codes = {field: codes[keep] for field, codes in self._codes.items()}
+            self._row_of = {vector_id: row for row, vector_id in enumerate(self._ids)}
+            self._count = len(keep)
+            if self.ann:
+                self.ann.compact(keep)
+
+    def fetch_values(self, ids):
+        with self._lock:
+            self._reload_if_changed()
+            return {
+                vector_id: self._vectors[self._row_of[vector_id]].tolist()
+                for vector_id in ids if vector_id in self._row_of
+            }
+
+    def _replay(self, pending):
+        """Re-applies writes made since the last load on top of freshly loaded files."""
+        upserted = {vector_id for op, arg in pending if op == "upsert" for vector_id in arg}
+        latest = {  # Values as they stand now; an ID deleted afterwards is dropped again by the replay
+            vector_id: (self._vectors[self._row_of[vector_id]].copy(), self._metadata[self._row_of[vector_id]])
+            for vector_id in upserted if vector_id in self._row_of
+        }
+        self._load(locked=True)
+        for op, arg in pending:
+            if op == "upsert":
+                self._upsert([(vector_id, *latest[vector_id]) for vector_id in arg if vector_id in latest])
+            elif op == "delete":
+                self._delete(ids=arg)
+            else:
+                self._delete(filter=arg)
+
+    def flush(self):
+        """Writes the store to disk (atomically) if it changed."""
+        with self._lock:
+            if not self._pending:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # One writer at a time across workers
+
+                if os.path.exists(self._metadata_path) and os.path.getmtime(self._metadata_path) != self._loaded_mtime:
+                    # Another worker saved first: start from its files and replay our writes
+                    self._replay(self._pending)
+
+                # Write to temp files, then swap them in, so a crash never leaves a half-written store
+                vectors_tmp = self._vectors_path + ".tmp.npy"
+                metadata_tmp = self._metadata_path + ".tmp"
+                np.save(vectors_tmp, np.ascontiguousarray(self._vectors[:self._count]))
+                with open(metadata_tmp, "w") as f:
+                    json.dump({"ids": self._ids, "metadata": self._metadata}, f)
+                os.replace(vectors_tmp, self._vectors_path)
+                os.replace(metadata_tmp, self._metadata_path)
+                if self.ann:
+                    self.ann.save(self.directory)
+                self._loaded_mtime = os.path.getmtime(self._metadata_path)
+                self._pending = []
+
+VECTOR_BACKENDS = {"pinecone": PineconeVectorStore, "local": LocalVectorStore}
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_vector_store(index_name=PINECONE_INDEX_NAME, backend=VECTOR_BACKEND):
+    """
+    Returns the shared vector store for the configured backend, creating it on first use.
+    The local backend keeps a single store per LOCAL_VECTOR_DIR regardless of index_name.
+    Returns None if the backend cannot be initialized.
+    """
+    key = (backend, index_name if backend == "pinecone" else LOCAL_VECTOR_DIR)
+    with _stores_lock:
+        if key not in _stores:
+            try:
+                if backend == "pinecone":
+                    _stores[key] = PineconeVectorStore(index_name)
+                elif backend in VECTOR_BACKENDS:
+                    _stores[key] = VECTOR_BACKENDS[backend]()
+                else:
+                    raise ValueError(f"Unknown vector backend: {backend}")
+            except Exception as e:
+                logging.error(f"❌ Failed to initialize {backend} vector store: {str(e)}")
+                return None
+        return _stores[key]
@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+import time
+from config import (
+    WRITE_BEHIND_ENABLED, WRITE_BUFFER_SIZE, WRITE_BUFFER_BATCH, WRITE_BUFFER_INTERVAL, WRITE_BUFFER_PUT_TIMEOUT,
+)
+from models.metrics import track
+
+class WriteBehindBuffer:
+    """
+    Collects log-style Mongo inserts (history, feedback, exams) and writes them from a background
+    thread with insert_many(ordered=False) once batch_size documents are waiting or flush_interval
+    seconds have passed. When the buffer is full, put() blocks for up to put_timeout seconds
+    (backpressure) and then drops the document. Dropped and failed writes are counted in stats().
+    """
+
+    def __init__(self, max_size=WRITE_BUFFER_SIZE, batch_size=WRITE_BUFFER_BATCH,
+                 flush_interval=WRITE_BUFFER_INTERVAL, put_timeout=WRITE_BUFFER_PUT_TIMEOUT, enabled=WRITE_BEHIND_ENABLED):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def _ensure_thread(self):
+        # Started on first use, so each forked Gunicorn worker gets its own writer thread
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="mongo-write-behind", daemon=True)
+                    self._thread.start()
+
+    def put(self, collection, document):
+        """Queues a document for insertion into collection; returns False if it was dropped."""
+        if not self.enabled or self._closed:
+            with track("mongo_insert"):
+                collection.insert_one(document)
+            return True
+
+        self._ensure_thread()
+        try:
+            self._queue.put((collection, document), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logging.warning(f"⚠️ Write buffer full; dropped a {collection.name} document.")
+            return False
+
+    def _take_batch(self):
+        """Waits for up to flush_interval to gather a batch; returns [] if nothing arrived."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        by_collection = {}
+        for collection, document in batch:
+            by_collection.setdefault(collection.name, (collection, []))[1].append(document)
+
+        for name, (collection, documents) in by_collection.items():
+            try:
+                with track("mongo_insert_many", batch_size=len(documents)):
+                    collection.insert_many(documents, ordered=False)
+                written, failed = len(documents), 0
+            except Exception as e:
+                # BulkWriteError reports per-document failures; anything else failed the whole batch
+                details = getattr(e, "details", None) or {}
+                failed = len(details.get("writeErrors", [])) if details else len(documents)
+                written = len(documents) - failed
+                logging.error(f"❌ Write-behind insert into {name} failed for {failed} documents: {str(e)}")
+            with self._lock:
+                self.written += written
+                self.failed += failed
+                self.flushes += 1
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                try:
+                    self._write(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every queued document has been written (or has failed)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Flushes what is queued; later writes go straight to Mongo. Registered to run at shutdown."""
+        self.flush()
+        self._closed = True
+        logging.info(f"✅ Write buffer closed: {self.stats()}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+            }
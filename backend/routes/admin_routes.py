@@ -73,13 +73,13 @@
 #     except Exception as e:
 #         return jsonify({"error": str(e)}), 500
 
-import jwt
-import datetime
 import os
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
-from werkzeug.security import generate_password_hash, check_password_hash
-from config import MONGO_URI
+from users.passwords import PasswordHashingBusy
+from users.sessions import add_session, revoke_session
+from users.utils import hash_password, verify_password, generate_admin_token, admin_token_required
+from models.database import admins
+from models.question_bank import import_past_exams
 
 # Load SECRET_KEY securely
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -89,11 +89,6 @@ if not SECRET_KEY:
 # Create Blueprint for admin routes
 admin_bp = Blueprint("admin", __name__)
 
-# Connect to MongoDB
-client = MongoClient(MONGO_URI)
-db = client["education_ai"]
-admins = db["admins"]
-
 @admin_bp.route("/register", methods=["POST"])
 def register_admin():
     """Registers a new admin"""
@@ -106,13 +101,13 @@ def register_admin():
         if not full_name or not email or not password:
             return jsonify({"error": "Missing required fields"}), 400
 
-        # Hash the password before saving
-        hashed_password = generate_password_hash(password)
-
         # Check if admin already exists
-        if admins.find_one({"email": email}):
+        if admins.find_one({"email": email}, {"_id": 1}):
             return jsonify({"error": "Admin already exists"}), 409
 
+        # Hash the password before saving
+        hashed_password = hash_password(password)
+
         # Save admin to the database
         admin_id = admins.insert_one({
             "fullName": full_name,
@@ -122,6 +117,8 @@ def register_admin():
 
         return jsonify({"message": "Admin registered successfully", "admin_id": str(admin_id)}), 201
 
+    except PasswordHashingBusy as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": f"Internal Server Error: {str(e)}"}), 500
 
@@ -136,21 +133,40 @@ def login_admin():
         if not email or not password:
             return jsonify({"error": "Missing email or password"}), 400
 
-        admin = admins.find_one({"email": email})
-        if not admin or not check_password_hash(admin["password"], password):
+        admin = admins.find_one({"email": email}, {"password": 1})
+        if not admin:
             return jsonify({"error": "Invalid email or password"}), 401
 
-        # Generate a JWT token
-        token = jwt.encode(
-            {
-                "admin_id": str(admin["_id"]),
-                "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=2)  # Token expires in 2 hours
-            },
-            SECRET_KEY,
-            algorithm="HS256",
-        )
+        matches, upgraded_hash = verify_password(admin["password"], password)
+        if not matches:
+            return jsonify({"error": "Invalid email or password"}), 401
+        if upgraded_hash:  # Stored with older hashing parameters
+            admins.update_one({"_id": admin["_id"]}, {"$set": {"password": upgraded_hash}})
+
+        # Generate a JWT token and track its session, so it can be revoked like user tokens
+        token = generate_admin_token(str(admin["_id"]), email)
+        add_session(email, token)
 
         return jsonify({"message": "Login successful", "token": token}), 200
 
+    except PasswordHashingBusy as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": f"Internal Server Error: {str(e)}"}), 500
+
+@admin_bp.route("/logout", methods=["POST"])
+@admin_token_required
+def logout_admin():
+    """Revokes the session of the admin token used for this request"""
+    revoke_session(request.token_claims)
+    return jsonify({"message": "Logged out"}), 200
+
+@admin_bp.route("/question-bank/import", methods=["POST"])
+@admin_token_required
+def import_question_bank():
+    """Seeds the question bank from the exams already stored; questions the bank holds already are skipped"""
+    try:
+        added = import_past_exams()
+        return jsonify({"message": f"Imported {added} questions from past exams", "imported": added}), 200
     except Exception as e:
         return jsonify({"error": f"Internal Server Error: {str(e)}"}), 500
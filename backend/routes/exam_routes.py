@@ -1,6 +1,13 @@
+import logging
+import time
 from flask import Blueprint, request, jsonify
+from config import BATCH_MAX_ITEMS, QUESTION_BANK_ENABLED
 from models.gemini import generate_exam
-from models.database import store_exam
+from models.async_rag import run_async, generate_exam_async
+from models.batch import generate_exams_batch, mark_exams_batch
+from models.database import store_exam, store_exam_marking
+from models.question_bank import question_bank, assemble_exam, schedule_top_up
+from routes.sse import sse_event, sse_stream
 
 exam_bp = Blueprint("exam", __name__)
 
@@ -8,13 +15,143 @@ exam_bp = Blueprint("exam", __name__)
 def generate_exam_route():
     """Generate an exam based on user input"""
     data = request.json
-    subject, difficulty, num_questions = (
-        data["subject"], data["difficulty"], data["numQuestions"]
+    grade, subject, difficulty, num_questions = (
+        data.get("grade"), data["subject"], data["difficulty"], data["numQuestions"]
     )
 
     try:
-        questions = generate_exam(subject, difficulty, num_questions)
-        store_exam(subject, difficulty, questions)
+        if QUESTION_BANK_ENABLED:
+            # Assemble from the question bank; only generates live when the bank is short
+            result = assemble_exam(grade, subject, difficulty, num_questions)
+            questions, source = result["exam"], result["source"]
+        else:
+            questions, source = generate_exam(grade, subject, num_questions), "live"
+        store_exam(subject, difficulty, questions, grade)
+        return jsonify({"exam": questions, "source": source}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@exam_bp.route("/question-bank/top-up", methods=["POST"])
+def top_up_question_bank_route():
+    """Queue a background top-up of the question bank for a grade, subject and difficulty"""
+    data = request.get_json()
+    if not data or "subject" not in data:
+        return jsonify({"error": "Subject field is required"}), 400
+
+    grade, subject, difficulty = data.get("grade"), data["subject"], data.get("difficulty")
+    schedule_top_up(grade, subject, difficulty)
+    return jsonify({
+        "message": "Top-up queued",
+        "questions": question_bank.count(grade, subject, difficulty)
+    }), 202
+
+@exam_bp.route("/generate-exam/async", methods=["POST"])
+def generate_exam_async_route():
+    """Generate an exam on the async path; the exam is stored in the background"""
+    data = request.json
+    grade, subject, difficulty, num_questions = (
+        data.get("grade"), data["subject"], data["difficulty"], data["numQuestions"]
+    )
+
+    try:
+        questions = run_async(generate_exam_async(
+            grade, subject, num_questions,
+            store=lambda text: store_exam(subject, difficulty, text, grade)
+        ))
         return jsonify({"exam": questions}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+def _batch_items(data, field, required):
+    """Validates a batch request body; returns (items, None) or (None, error response)."""
+    items = (data or {}).get(field)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"{field} must be a non-empty list"}), 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, (jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or required not in item:
+            return None, (jsonify({"error": f"Item {index} is missing {required}"}), 400)
+    return items, None
+
+def _batch_response(results, output_field, on_result, stream):
+    """
+    Stores each finished item with on_result(index, text) and returns the batch either as one JSON
+    body (in input order) or, with stream=True, as Server-Sent Events in completion order.
+    """
+    started = time.perf_counter()
+
+    def finished():
+        for index, result in results:
+            item = {"index": index, "status": result["status"]}
+            if result["status"] == "ok":
+                try:
+                    on_result(index, result["text"])
+                except Exception as e:
+                    logging.error(f"❌ Failed to store batch item {index}: {str(e)}")
+                item[output_field] = result["text"]
+            else:
+                item["error"] = result["error"]
+            yield item
+
+    if not stream:
+        items = sorted(finished(), key=lambda item: item["index"])
+        succeeded = sum(item["status"] == "ok" for item in items)
+        return jsonify({"results": items, "succeeded": succeeded, "failed": len(items) - succeeded}), 200
+
+    def events():
+        succeeded = failed = 0
+        for item in finished():
+            succeeded += item["status"] == "ok"
+            failed += item["status"] != "ok"
+            yield sse_event("item", item)
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        yield sse_event("done", {"succeeded": succeeded, "failed": failed, "total_ms": total_ms})
+
+    return sse_stream(events())
+
+@exam_bp.route("/generate-exams/batch", methods=["POST"])
+def generate_exams_batch_route():
+    """
+    Generate many exams in one call: {"exams": [{"grade", "subject", "difficulty", "numQuestions"}], "stream": bool}.
+    Each exam is stored as soon as it is generated.
+    """
+    data = request.get_json()
+    specs, error = _batch_items(data, "exams", "subject")
+    if error:
+        return error
+
+    try:
+        results = generate_exams_batch(specs)
+        return _batch_response(
+            results, "exam",
+            lambda index, text: store_exam(
+                specs[index]["subject"], specs[index].get("difficulty"), text, specs[index].get("grade")
+            ),
+            data.get("stream", False)
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@exam_bp.route("/mark-exams/batch", methods=["POST"])
+def mark_exams_batch_route():
+    """
+    Mark many answer sheets in one call: {"sheets": [{"answers", "grade", "subject"}], "stream": bool}.
+    Each marking is stored as soon as it is ready.
+    """
+    data = request.get_json()
+    sheets, error = _batch_items(data, "sheets", "answers")
+    if error:
+        return error
+
+    try:
+        results = mark_exams_batch(sheets)
+        return _batch_response(
+            results, "marking",
+            lambda index, text: store_exam_marking(
+                sheets[index].get("grade"), sheets[index].get("subject"), sheets[index]["answers"], text
+            ),
+            data.get("stream", False)
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,38 @@
+import hmac
+from flask import Blueprint, Response, request, jsonify
+from config import METRICS_TOKEN
+from models.database import log_writer
+from models.embedding import query_cache
+from models.metrics import registry
+from models.response_cache import response_cache
+from models.single_flight import query_flight, answer_flight
+from users.passwords import password_hasher
+from users.sessions import session_store
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Component counters exposed alongside the latency histograms
+registry.register_gauges("query_embedding_cache", query_cache.stats)
+registry.register_gauges("response_cache", response_cache.stats)
+registry.register_gauges("query_single_flight", query_flight.stats)
+registry.register_gauges("answer_single_flight", answer_flight.stats)
+registry.register_gauges("write_buffer", log_writer.stats)
+registry.register_gauges("password_hashing", password_hasher.stats)
+registry.register_gauges("session_cache", session_store.stats)
+
+LOOPBACK_ADDRESSES = {"127.0.0.1", "::1"}
+
+def _scrape_allowed():
+    """With METRICS_TOKEN set, the scraper must send it as a Bearer token; without it only local scrapes are answered."""
+    if METRICS_TOKEN:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        return hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+    return request.remote_addr in LOOPBACK_ADDRESSES
+
+# 📈 Prometheus scrape endpoint
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Stage latency histograms, error counts, batch and prompt sizes, in the Prometheus text format."""
+    if not _scrape_allowed():
+        return jsonify({"error": "Not authorized to read metrics"}), 403
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -1,51 +1,20 @@
 from flask import Blueprint, request, jsonify
-from models.embedding import generate_embedding
-from models.gemini import generate_response
-from pinecone import Pinecone
-from config import PINECONE_API_KEY
+from models.gemini import answer_query
+from models.async_rag import run_async, query_async, answer_query_async
+from models.retrieval import get_retrieval_service
+from models.single_flight import query_flight
 from users.utils import token_required  # Import authentication decorator
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index_name = "education-ai"
-
-# Ensure index exists before querying
-existing_indexes = [index["name"] for index in pc.list_indexes()]
-if index_name not in existing_indexes:
-    raise ValueError(f"Pinecone index '{index_name}' not found. Ensure it is created.")
-
-index = pc.Index(index_name)
-
 query_bp = Blueprint("query_bp", __name__)
 
 def query_pinecone(query_text, grade=None, subject=None, top_k=5):
-    """Query Pinecone for relevant results based on query, grade, and subject."""
-    query_embedding = generate_embedding(query_text)
-
-    # Build metadata filter
-    metadata_filter = {}
-    if grade:
-        metadata_filter["grade"] = grade
-    if subject:
-        metadata_filter["subject"] = subject
-
-    # Search Pinecone with filters
-    try:
-        response = index.query(
-            vector=query_embedding, 
-            top_k=top_k, 
-            include_metadata=True,
-            filter=metadata_filter if metadata_filter else None  # Apply filter only if needed
-        )
-    except Exception as e:
-        return {"error": f"Pinecone query failed: {str(e)}"}
-
-    # Extract relevant results
-    results = [
-        match["metadata"]["text"] for match in response.get("matches", []) if "metadata" in match
-    ]
-
-    return results
+    """
+    Query Pinecone for relevant results based on query, grade, and subject.
+    Identical concurrent queries share one embedding + search.
+    """
+    key = query_flight.make_key(query_text, grade, subject, top_k)
+    matches, _ = query_flight.do(key, lambda: get_retrieval_service().search(query_text, grade, subject, top_k))
+    return matches
 
 @query_bp.route("/", methods=["POST"])
 @token_required
@@ -64,11 +33,81 @@ def query_pdf(user_data):
     subject = data.get("subject")
 
     try:
-        results = query_pinecone(query_text, grade, subject)
+        matches = query_pinecone(query_text, grade, subject)
+        if isinstance(matches, dict):
+            return jsonify(matches), 500
+
         return jsonify({
             "success": True,
-            "results": results,
+            "results": [match["text"] for match in matches],
+            "matches": [{"id": match["id"], "score": match["score"]} for match in matches],
             "user": user_data["email"]  # Return minimal user info
         }), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@query_bp.route("/answer", methods=["POST"])
+@token_required
+def answer(user_data):
+    """Answer a query with RAG + Gemini, reporting per-stage timings; the answer is logged to history."""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    if "query" not in data:
+        return jsonify({"error": "Query field is required"}), 400
+
+    try:
+        result = answer_query(data["query"], data.get("grade"), data.get("subject"), user_data["email"])
+        return jsonify({"success": True, **result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@query_bp.route("/async", methods=["POST"])
+@token_required
+def query_pdf_async(user_data):
+    """
+    Same as POST /query on the async path. An optional "filters" list of {"grade", "subject"}
+    searches several grades/subjects concurrently and merges the results.
+    """
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    if "query" not in data:
+        return jsonify({"error": "Query field is required"}), 400
+
+    filters = [(f.get("grade"), f.get("subject")) for f in data.get("filters") or []]
+    if not filters:
+        filters = [(data.get("grade"), data.get("subject"))]
+
+    try:
+        matches = run_async(query_async(data["query"], filters, data.get("top_k", 5)))
+        if isinstance(matches, dict):
+            return jsonify(matches), 500
+
+        return jsonify({
+            "success": True,
+            "results": [match["text"] for match in matches],
+            "matches": [{"id": match["id"], "score": match["score"]} for match in matches],
+            "user": user_data["email"]  # Return minimal user info
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@query_bp.route("/answer/async", methods=["POST"])
+@token_required
+def answer_async(user_data):
+    """Same as POST /query/answer on the async path."""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    if "query" not in data:
+        return jsonify({"error": "Query field is required"}), 400
+
+    try:
+        result = run_async(answer_query_async(data["query"], data.get("grade"), data.get("subject"), user_data["email"]))
+        return jsonify({"success": True, **result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,14 @@
+import json
+from flask import Response, stream_with_context
+
+def sse_event(event, payload):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def sse_stream(events):
+    """Streams already formatted events (see sse_event) as a text/event-stream response."""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Stop proxies buffering the stream
+    )
@@ -0,0 +1,80 @@
+import logging
+import time
+from flask import Blueprint, request, jsonify
+from models.gemini import stream_answer, stream_exam, stream_marking
+from models.database import save_user_query, store_exam, store_exam_marking
+from routes.sse import sse_event, sse_stream
+from users.utils import token_required  # Import authentication decorator
+
+stream_bp = Blueprint("stream_bp", __name__)
+
+def sse_response(pieces, on_complete, started):
+    """
+    Streams text pieces to the client as Server-Sent Events ("token" events, then one "done"
+    event carrying time-to-first-byte and total time). on_complete(full_text) persists the
+    result once the stream has finished.
+    """
+    def events():
+        first_token_ms = None
+        parts = []
+        try:
+            for text in pieces:
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 2)
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+
+            full_text = "".join(parts)
+            on_complete(full_text)
+            total_ms = round((time.perf_counter() - started) * 1000, 2)
+            logging.info(f"📡 {request.path} streamed {len(full_text)} chars: TTFB {first_token_ms} ms, total {total_ms} ms")
+            yield sse_event("done", {"ttfb_ms": first_token_ms, "total_ms": total_ms, "chars": len(full_text)})
+        except Exception as e:
+            logging.error(f"❌ Stream failed: {str(e)}")
+            yield sse_event("error", {"error": str(e)})
+
+    return sse_stream(events())
+
+@stream_bp.route("/answer", methods=["POST"])
+@token_required
+def stream_answer_route(user_data):
+    """Stream a RAG answer token by token, then log it to history."""
+    started = time.perf_counter()
+    data = request.get_json()
+
+    if not data or "query" not in data:
+        return jsonify({"error": "Query field is required"}), 400
+
+    query = data["query"]
+    matches, pieces = stream_answer(query, data.get("grade"), data.get("subject"))
+    return sse_response(
+        pieces,
+        lambda text: save_user_query(user_data["email"], query, text, [match["text"] for match in matches]),
+        started
+    )
+
+@stream_bp.route("/generate-exam", methods=["POST"])
+def stream_exam_route():
+    """Stream a generated exam, then store it in the exams collection."""
+    started = time.perf_counter()
+    data = request.get_json()
+
+    if not data or "subject" not in data:
+        return jsonify({"error": "Subject field is required"}), 400
+
+    grade, subject, difficulty = data.get("grade"), data["subject"], data.get("difficulty")
+    pieces = stream_exam(grade, subject, data.get("numQuestions", 5))
+    return sse_response(pieces, lambda text: store_exam(subject, difficulty, text, grade), started)
+
+@stream_bp.route("/mark-exam", methods=["POST"])
+def stream_marking_route():
+    """Stream marking feedback for a student's answers, then store it in the exams collection."""
+    started = time.perf_counter()
+    data = request.get_json()
+
+    if not data or "answers" not in data:
+        return jsonify({"error": "Answers field is required"}), 400
+
+    answers, grade, subject = data["answers"], data.get("grade"), data.get("subject")
+    pieces = stream_marking(answers, grade, subject)
+    return sse_response(pieces, lambda text: store_exam_marking(grade, subject, answers, text), started)
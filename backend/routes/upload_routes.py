@@ -1,46 +1,20 @@
-import jwt
 from flask import Blueprint, request, jsonify
-import fitz  # PyMuPDF
 from flask_cors import CORS  # Import CORS
-from functools import wraps
-from config import SECRET_KEY
-from models.embedding import generate_embedding
-from models.rag import store_in_pinecone, delete_from_pinecone
-from models.database import save_pdf_metadata, store_teacher_feedback, store_parent_feedback, save_user_query, pdf_uploads
+from models.rag import delete_from_pinecone
+from models.ingestion import enqueue_upload, get_job_status
+from models.database import store_teacher_feedback, store_parent_feedback, save_user_query, pdf_uploads
+from users.utils import admin_token_required
 
 
 upload_bp = Blueprint("upload_bp", __name__)
 CORS(upload_bp)  # Apply CORS to this blueprint
-# 📝 Extract text from PDF
-def extract_text_from_pdf(file):
-    """Extract text from all pages of a PDF file."""
-    doc = fitz.open(stream=file.read(), filetype="pdf")  # Read from file stream
-    full_text = [page.get_text("text") for page in doc if page.get_text("text").strip()]
-    return "\n".join(full_text)
 
 # 📂 Upload a new PDF (Admins only)
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        if not token:
-            return jsonify({"error": "Token is missing"}), 401
-
-        try:
-            decoded = jwt.decode(token.split(" ")[1], SECRET_KEY, algorithms=["HS256"])
-            request.admin_id = decoded["admin_id"]
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
-
-        return f(*args, **kwargs)
-    return decorated
 @upload_bp.route("/upload", methods=["POST"])
-@token_required
+@admin_token_required
 def upload_pdf():
     print("Incoming Request:", request.form, request.files) 
-    """Handle PDF upload, extract, chunk, embed, and store in Pinecone."""
+    """Handle PDF upload by queueing it for extraction, chunking, embedding and storage in Pinecone."""
 
     # Check for missing file or admin_id
     if "file" not in request.files or "admin_id" not in request.form:
@@ -54,32 +28,35 @@ def upload_pdf():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    filename = file.filename  # ✅ Extract filename correctly
+    # ✅ Queue extraction, chunking, embedding and upserting on the ingestion workers
+    job_id = enqueue_upload(file, admin_id, grade, subject)
 
-    # Extract text from PDF
-    pdf_text = extract_text_from_pdf(file)
+    return jsonify({
+        "message": f"Upload of {file.filename} queued for processing.",
+        "job_id": job_id,
+        "status_url": f"/upload/status/{job_id}"
+    }), 202
 
-    # Chunk the text
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    chunks = text_splitter.split_text(pdf_text)
+# ⏳ Check the progress of a queued upload (Admins only)
+@upload_bp.route("/upload/status/<job_id>", methods=["GET"])
+@admin_token_required
+def upload_status(job_id):
+    """Reports the stage, chunk progress and errors of an ingestion job."""
+    status = get_job_status(job_id)
+    if not status:
+        return jsonify({"error": "Job not found"}), 404
 
-    # ✅ Store in Pinecone with correct filename argument
-    store_in_pinecone(chunks, grade, subject, filename)
-
-    # ✅ Store metadata in MongoDB
-    save_pdf_metadata(admin_id, filename, grade, subject, len(chunks))
-
-    return jsonify({"message": f"Uploaded {len(chunks)} chunks!"}), 200
+    return jsonify(status), 200
 
 
 # 🗑️ Delete a PDF (Admins only)
 @upload_bp.route("/delete/<filename>", methods=["DELETE"])
 def delete_pdf(filename):
     """Deletes a PDF's metadata & removes associated chunks from Pinecone."""
-    deleted_file = pdf_uploads.find_one_and_delete({"filename": filename})
-    
+    deleted_file = pdf_uploads.find_one_and_delete({"filename": filename}, projection={"_id": 1})
+
     if deleted_file:
+        pdf_uploads.delete_many({"filename": filename})  # Earlier uploads of the file, and their chunk manifests
         delete_from_pinecone(filename)
         return jsonify({"message": f"Deleted {filename} from system."}), 200
     
@@ -93,6 +70,7 @@ def update_pdf(filename):
     updated_file = pdf_uploads.find_one_and_update(
         {"filename": filename},
         {"$set": update_data},
+        projection={"_id": 1},
         return_document=True
     )
 
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# Tests run offline: local vector store, fake LLM, no warm-up, scratch data directory
+_data_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-with-enough-bytes-for-hs256")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_DIR", os.path.join(_data_dir, "vectors"))
+os.environ.setdefault("BM25_PATH", os.path.join(_data_dir, "bm25.pkl"))
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_DELAY_MS", "0")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("WARMUP_ON_START", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
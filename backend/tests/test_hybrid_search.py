@@ -0,0 +1,52 @@
+import numpy as np
+from models import retrieval
+from models.bm25 import BM25Index
+from models.retrieval import RetrievalService
+from models.vector_store import LocalVectorStore
+
+TEXTS = {
+    "cells": "Cells release energy from food during respiration.",
+    "atp": "ATP synthase turns the proton gradient into ATP.",
+    "plants": "Plants capture light energy in their chloroplasts.",
+    "rocks": "Sedimentary rocks form in layers over time.",
+}
+
+def _unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return (vector / np.linalg.norm(vector)).tolist()
+
+# Embeddings where "cells" is the closest meaning to the query, and "atp" only second
+EMBEDDINGS = {
+    "cells": _unit(1.0, 0.1),
+    "atp": _unit(0.8, 0.6),
+    "plants": _unit(0.3, 0.0, 1.0),
+    "rocks": _unit(0.0, 0.0, 0.0, 1.0),
+}
+QUERY = "How does ATP synthase work?"
+QUERY_EMBEDDING = _unit(1.0, 0.2)
+
+def _service(tmp_path, monkeypatch, hybrid):
+    store = LocalVectorStore(directory=str(tmp_path / "vectors"), dimension=8)
+    bm25_index = BM25Index(path=str(tmp_path / "bm25.pkl"))
+    vectors = []
+    for chunk_id, text in TEXTS.items():
+        metadata = {"text": text, "grade": "9", "subject": "biology", "filename": "bio.pdf", "chunk": len(vectors)}
+        vectors.append((chunk_id, EMBEDDINGS[chunk_id], metadata))
+        bm25_index.add(chunk_id, text, metadata)
+    store.upsert(vectors)
+    monkeypatch.setattr(retrieval, "get_bm25_index", lambda: bm25_index)
+
+    service = RetrievalService(backend="local", hybrid=hybrid)
+    service._vector_store = store
+    return service
+
+def test_vector_search_alone_ranks_the_closest_meaning_first(tmp_path, monkeypatch):
+    results = _service(tmp_path, monkeypatch, hybrid=False).search(QUERY, "9", "biology", 3, QUERY_EMBEDDING)
+    assert [result["id"] for result in results][:2] == ["cells", "atp"]
+
+def test_hybrid_search_ranks_the_exact_keyword_match_first(tmp_path, monkeypatch):
+    results = _service(tmp_path, monkeypatch, hybrid=True).search(QUERY, "9", "biology", 3, QUERY_EMBEDDING)
+
+    assert results[0]["id"] == "atp"
+    assert results[0]["text"] == TEXTS["atp"]
@@ -0,0 +1,54 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import fitz
+import pytest
+
+pytest.importorskip("pymongo")  # models.ingestion records job progress through models.database
+
+from models import ingestion
+
+class _FlakyPool:
+    """Runs shards inline; submissions after the first `healthy` fail the way a pool with a dead process does."""
+
+    def __init__(self, healthy):
+        self.healthy = healthy
+        self.starts = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.starts.append(args[1])
+        if len(self.starts) > self.healthy:
+            future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        else:
+            future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = str(tmp_path / "book.pdf")
+    doc = fitz.open()
+    for i in range(10):
+        doc.new_page().insert_text((72, 72), f"page {i}")
+    doc.save(path)
+    doc.close()
+    return path
+
+def _extract(pdf, monkeypatch, pools):
+    monkeypatch.setattr(ingestion, "get_extract_pool", lambda workers: pools.pop(0))
+    return [text.strip() for text in ingestion._iter_page_texts_parallel(pdf, 10, workers=2, shard_pages=2)]
+
+def test_a_broken_pool_is_replaced_and_extraction_resumes(pdf, monkeypatch):
+    retry = _FlakyPool(healthy=100)
+
+    texts = _extract(pdf, monkeypatch, [_FlakyPool(healthy=2), retry])
+
+    assert texts == [f"page {i}" for i in range(10)]
+    assert retry.starts == [4, 6, 8]  # Pages 0-3 came back before the pool broke
+
+def test_pages_are_extracted_in_process_when_the_new_pool_breaks_too(pdf, monkeypatch):
+    texts = _extract(pdf, monkeypatch, [_FlakyPool(healthy=1), _FlakyPool(healthy=0)])
+
+    assert texts == [f"page {i}" for i in range(10)]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pymongo")  # The bank persists through models.database
+
+from models import database, question_bank as qb
+
+def _embed(texts, normalize=True):
+    vectors = np.zeros((len(texts), 4), dtype=np.float32)
+    for row, text in enumerate(texts):
+        vectors[row, int(text.split()[-1]) % 4] = 1.0  # "question N": questions N and N+4 are duplicates
+    return vectors
+
+@pytest.fixture
+def collection(monkeypatch):
+    stored = []
+    monkeypatch.setattr(database, "store_bank_questions", lambda items: stored.extend(dict(item) for item in items))
+    monkeypatch.setattr(database, "load_bank_questions", lambda grade, subject: [dict(item) for item in stored])
+    monkeypatch.setattr(database, "count_bank_questions", lambda grade, subject: len(stored))
+    monkeypatch.setattr(qb, "generate_embeddings", _embed)
+    return stored
+
+def _questions(*numbers):
+    return [{"question": f"question {n}", "options": [], "type": "short_answer"} for n in numbers]
+
+def test_a_worker_sees_questions_another_worker_added(collection):
+    first, second = qb.QuestionBank(), qb.QuestionBank()
+    assert second.count("5", "math") == 0  # Cached empty
+
+    assert first.add("5", "math", "easy", _questions(0, 1)) == 2
+    assert second.count("5", "math") == 0
+    assert second.count("5", "math", refresh=True) == 2
+
+def test_dedup_checks_questions_added_by_another_worker(collection):
+    first, second = qb.QuestionBank(), qb.QuestionBank()
+    second.count("5", "math")
+
+    first.add("5", "math", "easy", _questions(0, 1))
+
+    assert second.add("5", "math", "easy", _questions(4, 2)) == 1  # Question 4 duplicates question 0
+    assert [item["question"] for item in collection] == ["question 0", "question 1", "question 2"]
@@ -0,0 +1,58 @@
+import hashlib
+import numpy as np
+import pytest
+from models import rag
+from models.vector_store import LocalVectorStore
+
+def _embed(texts, batch_size=None):
+    """Deterministic stand-in for the embedding model: a unit vector seeded by each text."""
+    vectors = []
+    for text in texts:
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        vectors.append(np.random.default_rng(seed).standard_normal(8).astype(np.float32))
+    return vectors
+
+class _Service:
+    def __init__(self, store):
+        self.vector_store = store
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalVectorStore(directory=str(tmp_path), dimension=8)
+    monkeypatch.setattr(rag, "get_retrieval_service", lambda: _Service(store))
+    monkeypatch.setattr(rag, "generate_embeddings", _embed)
+    return store
+
+def _chunks(count, prefix="chunk"):
+    return [f"{prefix} {i} about photosynthesis" for i in range(count)]
+
+def test_reupload_skips_unchanged_chunks_and_removes_dropped_ones(store):
+    first = rag.store_chunk_stream(_chunks(10), "9", "biology", "bio.pdf")
+    assert (first["added"], first["skipped"], len(store)) == (10, 0, 10)
+
+    second = rag.store_chunk_stream(["a new opening chunk"] + _chunks(9), "9", "biology", "bio.pdf",
+                                    previous_manifest=first["manifest"])
+    assert (second["added"], second["removed"], second["skipped"], second["moved"]) == (1, 1, 9, 9)
+    assert len(store) == 10
+    # Shifted chunks carry their new position
+    row = store._row_of[second["manifest"][1]]
+    assert store._metadata[row]["chunk"] == 1
+
+def test_empty_reupload_keeps_the_existing_vectors(store):
+    first = rag.store_chunk_stream(_chunks(10), "9", "biology", "bio.pdf")
+
+    empty = rag.store_chunk_stream([], "9", "biology", "bio.pdf", previous_manifest=first["manifest"])
+    assert "error" in empty
+    assert len(store) == 10
+
+    again = rag.store_chunk_stream(_chunks(10), "9", "biology", "bio.pdf", previous_manifest=first["manifest"])
+    assert (again["added"], again["removed"], again["skipped"]) == (0, 0, 10)
+    assert len(store) == 10
+
+def test_chunks_missing_from_the_store_are_embedded_again(store):
+    first = rag.store_chunk_stream(_chunks(10), "9", "biology", "bio.pdf")
+    store.delete(ids=first["manifest"])
+
+    again = rag.store_chunk_stream(_chunks(10), "9", "biology", "bio.pdf", previous_manifest=first["manifest"])
+    assert (again["added"], again["skipped"]) == (10, 0)
+    assert len(store) == 10
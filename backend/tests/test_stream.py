@@ -0,0 +1,62 @@
+import json
+import pytest
+from flask import Flask
+
+pytest.importorskip("pymongo")  # routes.stream_routes persists results through models.database
+
+from routes import stream_routes
+
+def _events(body):
+    """Parses a Server-Sent Events body into [(event, payload)]."""
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        lines = block.split("\n")
+        assert len(lines) == 2 and lines[0].startswith("event: ") and lines[1].startswith("data: ")
+        events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return events
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(stream_routes.stream_bp, url_prefix="/stream")
+    return app.test_client()
+
+def test_mark_exam_streams_tokens_then_done(client, monkeypatch):
+    stored = []
+    monkeypatch.setattr(stream_routes, "store_exam_marking",
+                        lambda grade, subject, answers, text: stored.append(text))
+
+    response = client.post("/stream/mark-exam", json={"answers": "1. B 2. A", "grade": 9, "subject": "Physics"})
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    events = _events(body)
+    assert [event for event, _ in events[:-1]] == ["token"] * (len(events) - 1)
+    assert len(events) > 2
+    text = "".join(payload["text"] for _, payload in events[:-1])
+    assert text.startswith("[fake-llm] Response to:")
+
+    event, payload = events[-1]
+    assert event == "done"
+    assert payload["chars"] == len(text)
+    assert payload["ttfb_ms"] <= payload["total_ms"]
+    assert stored == [text]
+
+def test_a_failure_after_streaming_ends_with_an_error_event(client, monkeypatch):
+    def fail(grade, subject, answers, text):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(stream_routes, "store_exam_marking", fail)
+
+    events = _events(client.post("/stream/mark-exam", json={"answers": "1. B"}).get_data(as_text=True))
+
+    assert events[-1] == ("error", {"error": "database unavailable"})
+    assert all(event == "token" for event, _ in events[:-1])
+
+def test_missing_answers_is_rejected(client):
+    response = client.post("/stream/mark-exam", json={})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Answers field is required"}
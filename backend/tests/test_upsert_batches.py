@@ -0,0 +1,67 @@
+import json
+from models.rag import batch_vectors, upsert_in_batches
+
+def _vectors(count, dimension=384):
+    return [
+        (f"doc.pdf:{i:024x}", [0.123456789012345 + i] * dimension, {"text": f"chunk {i}", "filename": "doc.pdf"})
+        for i in range(count)
+    ]
+
+def _request_bytes(batch):
+    return len(json.dumps({"vectors": [{"id": i, "values": v, "metadata": m} for i, v, m in batch]}))
+
+class FakeIndex:
+    """Records upserts; the first `failures` calls for each batch raise."""
+
+    def __init__(self, failures=0, accept=None):
+        self.failures = failures
+        self.accept = accept
+        self.calls = []
+        self.attempts = {}
+
+    def upsert(self, vectors):
+        key = vectors[0][0]
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        self.calls.append(vectors)
+        if self.attempts[key] <= self.failures:
+            raise ConnectionError("upsert failed")
+        return {"upserted_count": len(vectors) if self.accept is None else self.accept}
+
+def test_batches_are_capped_by_count():
+    batches = list(batch_vectors(_vectors(25, dimension=4), batch_size=10, max_bytes=10 ** 9))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+def test_batches_stay_under_the_real_request_size():
+    max_bytes = 64 * 1024
+    batches = list(batch_vectors(_vectors(100), batch_size=1000, max_bytes=max_bytes))
+    assert sum(len(batch) for batch in batches) == 100
+    assert len(batches) > 1
+    for batch in batches:
+        assert _request_bytes(batch) <= max_bytes
+
+def test_failed_batches_are_retried():
+    index = FakeIndex(failures=2)
+    result = upsert_in_batches(index, _vectors(30, dimension=4), batch_size=10, max_workers=2, max_retries=3, backoff=0)
+    assert result["accepted"] == 30
+    assert result["failed"] == 0
+    assert [batch["attempts"] for batch in result["batches"]] == [3, 3, 3]
+
+def test_batches_that_keep_failing_are_reported():
+    index = FakeIndex(failures=10)
+    seen = []
+    result = upsert_in_batches(index, _vectors(20, dimension=4), batch_size=10, max_retries=1, backoff=0, on_batch=seen.append)
+    assert result["accepted"] == 0
+    assert result["failed"] == 20
+    assert all("error" in batch and batch["attempts"] == 2 for batch in result["batches"])
+    assert len(seen) == 2
+
+def test_partially_accepted_batches_count_the_rest_as_failed():
+    result = upsert_in_batches(FakeIndex(accept=7), _vectors(10, dimension=4), batch_size=10, backoff=0)
+    assert result == {"accepted": 7, "failed": 3, "batches": [{"batch": 0, "accepted": 7, "failed": 3, "attempts": 1}]}
+
+def test_only_fully_accepted_batches_are_reported_as_stored():
+    stored = []
+    result = upsert_in_batches(FakeIndex(accept=7), _vectors(17, dimension=4), batch_size=10, backoff=0,
+                               on_stored=lambda batch: stored.extend(vector_id for vector_id, _, _ in batch))
+    assert result["failed"] == 3
+    assert stored == [vector_id for vector_id, _, _ in _vectors(17, dimension=4)[10:]]
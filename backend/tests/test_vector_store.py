@@ -0,0 +1,40 @@
+import numpy as np
+from models.ann_index import IVFIndex
+from models.vector_store import LocalVectorStore
+
+def _vectors(count, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        (f"v{i}", rng.standard_normal(dimension).tolist(), {"grade": str(i % 3), "subject": "math", "filename": "a.pdf"})
+        for i in range(count)
+    ]
+
+def test_ivf_probing_every_list_matches_exact_search(tmp_path):
+    store = LocalVectorStore(directory=str(tmp_path), dimension=16, index_mode="flat")
+    store.ann = IVFIndex(nlist=8, nprobe=8, min_train=100)
+    store.upsert(_vectors(400))
+    assert store.ann.trained
+
+    queries = np.random.default_rng(1).standard_normal((20, 16))
+    for query in queries:
+        for filter in (None, {"grade": "1"}):
+            approximate = store.query(query, top_k=10, filter=filter, nprobe=8)
+            exact = store.query(query, top_k=10, filter=filter, exact=True)
+            assert [match["id"] for match in approximate] == [match["id"] for match in exact]
+            assert np.allclose([match["score"] for match in approximate], [match["score"] for match in exact])
+
+def test_workers_sharing_a_directory_keep_each_others_writes(tmp_path):
+    first = LocalVectorStore(directory=str(tmp_path), dimension=16)
+    second = LocalVectorStore(directory=str(tmp_path), dimension=16)
+    vectors = _vectors(6)
+
+    first.upsert(vectors[:3])
+    second.upsert(vectors[3:])
+    first.flush()
+    second.delete(ids=["v3"])
+    second.flush()  # Saved after first: replays its writes on top of first's files
+
+    assert sorted(LocalVectorStore(directory=str(tmp_path), dimension=16)._ids) == ["v0", "v1", "v2", "v4", "v5"]
+    # first had nothing pending, so it reloads second's files before answering
+    matches = first.query(vectors[4][1], top_k=1)
+    assert matches[0]["id"] == "v4" and np.isclose(matches[0]["score"], 1.0)
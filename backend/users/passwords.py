@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from models.metrics import track
+from config import PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WAIT
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when the hashing pool already has max_pending requests waiting."""
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify(stored_password, provided_password, method, prefix):
+    """Checks a password and, when the stored hash uses other parameters, rehashes it. Runs in a pool process."""
+    if not check_password_hash(stored_password, provided_password):
+        return False, None
+    if stored_password.split("$", 1)[0] != prefix:
+        return True, generate_password_hash(provided_password, method=method)
+    return True, None
+
+class PasswordHasher:
+    """
+    Runs werkzeug's CPU-bound password hashing on a dedicated process pool so a login rush does not
+    pin the request threads. At most max_pending calls may be running or queued; further calls wait
+    up to wait seconds for a slot and then raise PasswordHashingBusy. workers=0 hashes inline.
+    """
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, wait=PASSWORD_HASH_WAIT):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._prefix = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_seconds = 0.0
+
+    def _get_pool(self):
+        # Created on first use, so each Gunicorn worker gets its own pool. Children are spawned, not
+        # forked, so they don't inherit the worker's threads and locks (Mongo client, write buffer).
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+
+    def _reset_pool(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        """Runs fn on the pool; if a pool process died (e.g. OOM-killed), starts a new pool and retries once."""
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            logging.warning("⚠️ Password hashing pool broke; starting a new one and retrying.")
+            self._reset_pool(pool)
+            return self._get_pool().submit(fn, *args).result()
+
+    @property
+    def prefix(self):
+        """The "method:params" prefix werkzeug writes for the configured method, e.g. "scrypt:32768:8:1"."""
+        if self._prefix is None:
+            self._prefix = generate_password_hash("", method=self.method).split("$", 1)[0]
+        return self._prefix
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            logging.warning(f"⚠️ Password hashing pool is full ({self.max_pending} pending); rejecting request.")
+            raise PasswordHashingBusy("Too many logins in progress, please retry shortly")
+
+        start = time.perf_counter()
+        with self._lock:
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            with track("password_hash"):
+                if self.workers <= 0:
+                    return fn(*args)
+                return self._submit(fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_seconds += time.perf_counter() - start
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, stored_password, provided_password):
+        """
+        :return: (matches, upgraded hash or None). The upgraded hash is set when the password matched
+                 but was stored with other parameters than the configured method.
+        """
+        matches, upgraded = self._run(_verify, stored_password, provided_password, self.method, self.prefix)
+        if upgraded:
+            with self._lock:
+                self.rehashed += 1
+        return matches, upgraded
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "queued": max(0, self.pending - self.workers),
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+            }
+
+password_hasher = PasswordHasher()
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
+from pymongo.errors import DuplicateKeyError
 from models.database import students, teachers, parents
-from users.utils import hash_password, verify_password, generate_token
-from users.sessions import add_session
+from users.utils import hash_password, verify_password, generate_token, token_required
+from users.passwords import PasswordHashingBusy
+from users.sessions import add_session, revoke_session
 users_bp = Blueprint("users", __name__)
 from flask_cors import CORS  # Import CORS
 
@@ -31,7 +33,10 @@ def register():
         return jsonify({"error": "Missing required fields"}), 400
 
     # Hash password and insert into DB
-    hashed_password = hash_password(password)
+    try:
+        hashed_password = hash_password(password)
+    except PasswordHashingBusy as e:
+        return jsonify({"error": str(e)}), 503
     user_data = {
         "fullName": full_name,
         "email": email,
@@ -44,17 +49,18 @@ def register():
             "parentEmail": data.get("parentEmail"),
             "gradeLevel": data.get("gradeLevel"),
         })
-        students.insert_one(user_data)
 
     elif user_type == "teacher":
         user_data.update({
             "qualifications": data.get("qualifications"),
             "subjects": data.get("subjects"),
         })
-        teachers.insert_one(user_data)
 
-    elif user_type == "parent":
-        parents.insert_one(user_data)
+    collection = {"student": students, "teacher": teachers, "parent": parents}[user_type]
+    try:
+        collection.insert_one(user_data)
+    except DuplicateKeyError:  # Unique email index
+        return jsonify({"error": "Email already registered"}), 409
 
     return jsonify({"message": f"{user_type.capitalize()} registered successfully!"}), 201
 
@@ -70,11 +76,20 @@ def login():
         return jsonify({"error": "Invalid credentials"}), 400
 
     collection = {"student": students, "teacher": teachers, "parent": parents}.get(user_type)
-    user = collection.find_one({"email": email})
+    user = collection.find_one({"email": email}, {"email": 1, "password": 1, "fullName": 1})
 
-    if not user or not verify_password(user["password"], password):
+    if not user:
         return jsonify({"error": "Invalid email or password"}), 401
 
+    try:
+        matches, upgraded_hash = verify_password(user["password"], password)
+    except PasswordHashingBusy as e:
+        return jsonify({"error": str(e)}), 503
+    if not matches:
+        return jsonify({"error": "Invalid email or password"}), 401
+    if upgraded_hash:  # Stored with older hashing parameters
+        collection.update_one({"_id": user["_id"]}, {"$set": {"password": upgraded_hash}})
+
     # Generate token and track session
     token = generate_token(user["email"], user_type)
     add_session(user["email"], token)
@@ -83,4 +98,11 @@ def login():
         "message": f"Welcome, {user_type.capitalize()}!",
         "token": token,
         "user": {"fullName": user["fullName"], "email": user["email"]}
-    }), 200
\ No newline at end of file
+    }), 200
+
+@users_bp.route("/logout", methods=["POST"])
+@token_required
+def logout(user_data):
+    """Revoke the session of the token used for this request."""
+    revoke_session(user_data)
+    return jsonify({"message": "Logged out"}), 200
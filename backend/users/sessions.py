@@ -1,13 +1,246 @@
-active_sessions = {}  # Store active user sessions
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import jwt
+from config import SESSION_BACKEND, SESSION_DB_PATH, SESSION_CACHE_TTL, SESSION_CACHE_SIZE
+
+class MemorySessionBackend:
+    """In-process sessions; only correct with a single worker (local development)."""
+
+    def __init__(self, sweep_interval=60):
+        self._lock = threading.Lock()
+        self._sessions = {}  # session_id -> (email, expires_at)
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def add(self, session_id, email, expires_at):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (email, expires_at)
+            if now >= self._next_sweep:
+                self._sessions = {sid: entry for sid, entry in self._sessions.items() if entry[1] > now}
+                self._next_sweep = now + self._sweep_interval
+
+    def is_active(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        return bool(entry) and entry[1] > time.time()
+
+    def revoke(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def revoke_user(self, email):
+        with self._lock:
+            self._sessions = {sid: entry for sid, entry in self._sessions.items() if entry[0] != email}
+
+    def has_user(self, email):
+        now = time.time()
+        with self._lock:
+            return any(entry[0] == email and entry[1] > now for entry in self._sessions.values())
+
+class SQLiteSessionBackend:
+    """File-backed sessions that several Gunicorn workers on one host can share."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, email TEXT, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_email ON sessions (email)")
+        self._conn.commit()
+
+    def _execute(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def add(self, session_id, email, expires_at):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, email, expires_at) VALUES (?, ?, ?)",
+                (session_id, email, expires_at)
+            )
+            self._conn.commit()
+
+    def is_active(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return bool(row) and row[0] > time.time()
+
+    def revoke(self, session_id):
+        self._execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def revoke_user(self, email):
+        self._execute("DELETE FROM sessions WHERE email = ?", (email,))
+
+    def has_user(self, email):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE email = ? AND expires_at > ? LIMIT 1", (email, time.time())
+            ).fetchone()
+        return row is not None
+
+class MongoSessionBackend:
+    """
+    Sessions in the Mongo sessions collection, shared by every worker and host. A TTL index on
+    expires_at (see models/db_indexes.py) lets Mongo delete expired sessions; reads also check
+    expires_at because the TTL monitor only runs about once a minute.
+    """
+
+    def __init__(self):
+        from models.database import sessions
+        self._sessions = sessions
+
+    def add(self, session_id, email, expires_at):
+        self._sessions.replace_one(
+            {"_id": session_id},
+            {"email": email, "expires_at": datetime.datetime.utcfromtimestamp(expires_at)},
+            upsert=True
+        )
+
+    def is_active(self, session_id):
+        session = self._sessions.find_one({"_id": session_id}, {"expires_at": 1})
+        return bool(session) and session["expires_at"] > datetime.datetime.utcnow()
+
+    def revoke(self, session_id):
+        self._sessions.delete_one({"_id": session_id})
+
+    def revoke_user(self, email):
+        self._sessions.delete_many({"email": email})
+
+    def has_user(self, email):
+        return self._sessions.find_one(
+            {"email": email, "expires_at": {"$gt": datetime.datetime.utcnow()}}, {"_id": 1}
+        ) is not None
+
+class SessionStore:
+    """
+    Tracks issued tokens by their jti so they can be revoked before they expire. Sessions live as
+    long as the token's exp. Each worker caches verification results for up to cache_ttl seconds
+    (never past the token's exp), so token_required does not hit the backend on every request;
+    a revocation made in another worker is therefore seen within cache_ttl.
+    """
+
+    def __init__(self, backend=None, cache_ttl=SESSION_CACHE_TTL, cache_size=SESSION_CACHE_SIZE):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # session_id -> (checked_until, active, email)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = _create_backend()
+        return self._backend
+
+    def _remember(self, session_id, active, email, expires_at):
+        checked_until = min(time.time() + self.cache_ttl, expires_at)
+        with self._lock:
+            self._cache[session_id] = (checked_until, active, email)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def add(self, session_id, email, expires_at):
+        self.backend.add(session_id, email, expires_at)
+        self._remember(session_id, True, email, expires_at)
+
+    def is_active(self, session_id, email, expires_at):
+        """Checks a token's session, answering from the local cache when the last check is recent."""
+        now = time.time()
+        if expires_at <= now:
+            return False
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry and entry[0] > now:
+                self._cache.move_to_end(session_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        active = self.backend.is_active(session_id)
+        self._remember(session_id, active, email, expires_at)
+        return active
+
+    def revoke(self, session_id):
+        self.backend.revoke(session_id)
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def revoke_user(self, email):
+        self.backend.revoke_user(email)
+        with self._lock:
+            for session_id in [sid for sid, entry in self._cache.items() if entry[2] == email]:
+                del self._cache[session_id]
+
+    def has_user(self, email):
+        return self.backend.has_user(email)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+def _create_backend():
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB_PATH)
+    if SESSION_BACKEND == "memory":
+        logging.warning("⚠️ Using in-process sessions; they are not shared between workers.")
+        return MemorySessionBackend()
+    return MongoSessionBackend()
+
+session_store = SessionStore()
+
+def _claims(token):
+    # The token was just issued (or already verified) by us; only its claims are needed here
+    return jwt.decode(token, options={"verify_signature": False})
 
 def add_session(email, token):
     """Store user session with token."""
-    active_sessions[email] = token
+    claims = _claims(token)
+    session_store.add(claims["jti"], email, claims["exp"])
+
+def is_session_active(claims):
+    """
+    Check that a verified token's session has not been revoked. Tokens issued before sessions were
+    tracked have no jti: they stay valid until their exp (at most 2 hours), so deploying session
+    tracking does not log everyone out, but they cannot be revoked.
+    """
+    if "jti" not in claims:
+        return claims["exp"] > time.time()
+    return session_store.is_active(claims["jti"], claims.get("email"), claims["exp"])
+
+def revoke_session(claims):
+    """Revoke the session of a single token (logout). Tokens without a jti have no session to revoke."""
+    if "jti" in claims:
+        session_store.revoke(claims["jti"])
 
 def remove_session(email):
-    """Remove user session."""
-    active_sessions.pop(email, None)
+    """Remove all of a user's sessions."""
+    session_store.revoke_user(email)
 
 def is_user_logged_in(email):
     """Check if user is logged in."""
-    return email in active_sessions
+    return session_store.has_user(email)
@@ -1,26 +1,42 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import datetime
 import os
+import uuid
 from functools import wraps  # Ensures function metadata is preserved
 from flask import request, jsonify
+from users.passwords import password_hasher
+from users.sessions import is_session_active
 
 # Load SECRET_KEY from config
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 def hash_password(password):
-    """Hash password before storing."""
-    return generate_password_hash(password)
+    """Hash password before storing (on the password hashing pool)."""
+    return password_hasher.hash(password)
 
 def verify_password(stored_password, provided_password):
-    """Verify provided password against stored hash."""
-    return check_password_hash(stored_password, provided_password)
+    """
+    Verify provided password against stored hash (on the password hashing pool).
+    :return: (matches, upgraded hash to store, or None if the stored hash is current)
+    """
+    return password_hasher.verify(stored_password, provided_password)
 
 def generate_token(user_email, user_type):
     """Generate JWT token for authenticated users."""
     payload = {
         "email": user_email,
         "user_type": user_type,
+        "jti": uuid.uuid4().hex,  # Session id, so the token can be revoked before it expires
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=2)  # Token expires in 2 hours
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+def generate_admin_token(admin_id, email):
+    """Generate JWT token for an admin; like user tokens it carries a jti so the session can be revoked."""
+    payload = {
+        "admin_id": admin_id,
+        "email": email,
+        "jti": uuid.uuid4().hex,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=2)  # Token expires in 2 hours
     }
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
@@ -49,7 +65,31 @@ def token_required(f):
         user_data = verify_token(token)
         if not user_data:
             return jsonify({"error": "Invalid or expired token!"}), 403
+        if not is_session_active(user_data):
+            return jsonify({"error": "Session has been revoked or expired"}), 403
 
         return f(user_data, *args, **kwargs)  # Pass user data to the route
     
     return decorated_function
+
+def admin_token_required(f):
+    """Decorator for admin-only routes: a valid admin JWT whose session has not been revoked."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get("Authorization")
+        if not token:
+            return jsonify({"error": "Token is missing"}), 401
+
+        try:
+            decoded = jwt.decode(token.split(" ")[1], SECRET_KEY, algorithms=["HS256"])
+            request.admin_id = decoded["admin_id"]
+        except jwt.ExpiredSignatureError:
+            return jsonify({"error": "Token has expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+        if not is_session_active(decoded):
+            return jsonify({"error": "Session has been revoked or expired"}), 401
+
+        request.token_claims = decoded
+        return f(*args, **kwargs)
+    return decorated